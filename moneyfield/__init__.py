@@ -1,4 +1,8 @@
-from .fields import MoneyField, MoneyModelForm
+from .fields import (MoneyField, MoneyModelForm, BaseMoneyModelFormSet,
+                     moneymodelformset_factory)
+from .managers import (MoneyManager, MoneyQuerySet, MoneyWindow,
+                       prefetch_money)
+from .compact import CompactMoney
 from .exceptions import *
 
 
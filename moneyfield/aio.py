@@ -0,0 +1,157 @@
+"""
+Coroutines running the Money-aware queryset helpers from asyncio code.
+
+The Django ORM is synchronous, so each operation runs in an executor
+thread (by default the event loop's executor, or the `executor` argument)
+with a single hop: one per call, or one per chunk when iterating. The
+Money objects are built in that thread, so the values returned can be used
+from the event loop without any further queries.
+
+Queries use the database connection of the executor thread, in autocommit
+mode and outside any transaction of the caller. Like at the start and end
+of a request, connections that are broken or older than CONN_MAX_AGE are
+closed before and after each hop.
+
+Written with asyncio.coroutine and "yield from"; await them as usual:
+    
+    total = yield from aaggregate_money(Book.objects.all(), 'price')
+
+Requires asyncio (Python 3.4, or the asyncio package on Python 3.3), and
+Python 3.5 for "async for".
+"""
+import asyncio
+import functools
+from collections import deque
+
+from django.db.models import Sum
+
+try:
+    from django.db import close_old_connections
+except ImportError:
+    # Django < 1.6, without persistent connections
+    from django.db import close_connection as close_old_connections
+
+from .managers import MoneyQuerySet, prefetch_money
+from .streaming import DEFAULT_CHUNK_SIZE, iter_money_values
+
+
+__all__ = ['aget', 'aaggregate_money', 'abulk_update', 'aiter_money_values']
+
+
+try:
+    from builtins import StopAsyncIteration
+except ImportError:
+    # Python < 3.5, without "async for": raised by __anext__() at the end
+    class StopAsyncIteration(Exception):
+        pass
+
+
+def _money_queryset(queryset):
+    # Accept managers, and querysets without MoneyQuerySet methods
+    return queryset.all()._clone(klass=MoneyQuerySet)
+
+
+def _call(function, args, kwargs):
+    close_old_connections()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def _run(executor, function, *args, **kwargs):
+    loop = asyncio.get_event_loop()
+    return loop.run_in_executor(executor, functools.partial(_call, function,
+                                                            args, kwargs))
+
+
+def _get(queryset, *args, **kwargs):
+    obj = queryset.get(*args, **kwargs)
+    # Load deferred money columns now, not on access from the event loop
+    prefetch_money([obj])
+    return obj
+
+
+@asyncio.coroutine
+def aget(queryset, *args, executor=None, **kwargs):
+    """
+    Like queryset.get(), with the MoneyFields of the object loaded, so that
+    reading them does not query the database.
+    """
+    queryset = _money_queryset(queryset)
+    return (yield from _run(executor, _get, queryset, *args, **kwargs))
+
+
+@asyncio.coroutine
+def aaggregate_money(queryset, name, aggregate=Sum, executor=None):
+    """Like MoneyQuerySet.aggregate_money()"""
+    queryset = _money_queryset(queryset)
+    return (yield from _run(executor, queryset.aggregate_money, name,
+                            aggregate))
+
+
+@asyncio.coroutine
+def abulk_update(queryset, objs, fields, batch_size=None, executor=None):
+    """Like MoneyQuerySet.bulk_update(), for all batches in one hop"""
+    queryset = _money_queryset(queryset)
+    return (yield from _run(executor, queryset.bulk_update, list(objs),
+                            fields, batch_size))
+
+
+def aiter_money_values(queryset, fields=(), chunk_size=DEFAULT_CHUNK_SIZE,
+                       executor=None):
+    """
+    Asynchronous iterator over the money_values() dicts of `queryset`,
+    reading it in chunks of `chunk_size` rows ordered by primary key, like
+    streaming.iter_money_values(), with one executor hop per chunk.
+    
+    Use it with "async for" (Python 3.5), or read each chunk with
+    "rows = yield from iterator.read()", which returns an empty list once
+    all rows have been read.
+    """
+    return MoneyValuesIterator(queryset, fields, chunk_size, executor)
+
+
+class MoneyValuesIterator(object):
+    """Asynchronous iterator returned by aiter_money_values()"""
+    def __init__(self, queryset, fields, chunk_size, executor):
+        self.chunk_size = chunk_size
+        self.executor = executor
+        self._rows = iter_money_values(_money_queryset(queryset), fields,
+                                       chunk_size)
+        self._buffer = deque()
+        self._done = False
+    
+    def _read_chunk(self):
+        # Each chunk is a single query: stop before asking the generator
+        # for the first row of the next one
+        rows = []
+        for row in self._rows:
+            rows.append(row)
+            if len(rows) == self.chunk_size:
+                break
+        else:
+            self._done = True
+        return rows
+    
+    @asyncio.coroutine
+    def read(self):
+        """Return the next chunk of rows"""
+        if self._buffer:
+            rows = list(self._buffer)
+            self._buffer.clear()
+            return rows
+        if self._done:
+            return []
+        return (yield from _run(self.executor, self._read_chunk))
+    
+    def __aiter__(self):
+        return self
+    
+    @asyncio.coroutine
+    def __anext__(self):
+        if not self._buffer:
+            self._buffer.extend((yield from self.read()))
+            if not self._buffer:
+                raise StopAsyncIteration
+        return self._buffer.popleft()
@@ -0,0 +1,54 @@
+"""
+Compact, immutable Money type for holding many values in memory.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+
+from money import Money
+
+
+__all__ = ['CompactMoney']
+
+
+REGEX_CURRENCY_CODE = re.compile('^[A-Z]{3}$')
+
+
+class CompactMoney(Money):
+    """
+    Immutable Money subclass storing its amount and currency in slots.
+    
+    Money has no __slots__, so instances keep a pointer to an instance
+    dict, but the slots of this subclass take over its attributes and the
+    dict is not allocated unless something asks for it (like vars()),
+    roughly halving the memory used by each value. Being a Money subclass,
+    CompactMoney works anywhere Money does: comparisons, arithmetic (which
+    returns CompactMoney) and conversions with Money.to().
+    """
+    __slots__ = ('_amount', '_currency')
+    
+    def __init__(self, amount='0', currency=None):
+        try:
+            amount = Decimal(amount)
+        except InvalidOperation:
+            raise ValueError("amount value could not be converted to "
+                             "Decimal(): '{}'".format(amount)) from None
+        if currency in (None, False, ''):
+            raise ValueError("invalid currency value: '{}'".format(currency))
+        if not REGEX_CURRENCY_CODE.match(currency):
+            raise ValueError("currency not in ISO 4217 format: "
+                             "'{}'".format(currency))
+        object.__setattr__(self, '_amount', amount)
+        object.__setattr__(self, '_currency', currency)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError('CompactMoney objects are immutable.')
+    
+    def __delattr__(self, name):
+        raise AttributeError('CompactMoney objects are immutable.')
+    
+    def __reduce__(self):
+        return (self.__class__, (self._amount, self._currency))
+    
+    def to_money(self):
+        """Return this value as a plain Money object"""
+        return Money(self._amount, self._currency)
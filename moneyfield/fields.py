@@ -1,29 +1,62 @@
+import copy
 import logging
-import re
-from decimal import Decimal
+from decimal import ROUND_HALF_EVEN, Context, Decimal, InvalidOperation
 
 from django import forms
 from django.core.exceptions import FieldError, ValidationError
-from django.forms.models import ModelFormMetaclass
+from django.forms.models import (BaseModelFormSet, ModelFormMetaclass,
+                                 modelformset_factory)
 from django.forms.util import flatatt
 from django.utils.datastructures import SortedDict
-from django.utils.encoding import force_text
 from django.utils.html import format_html
-from django.db import models
+from django.db import models, router
 from django.db.models import NOT_PROVIDED
 
 from money import Money
 
+try:
+    from django.utils.deconstruct import deconstructible
+except ImportError:
+    # Django < 1.7, without migrations
+    def deconstructible(klass):
+        return klass
+
+from .currencies import CURRENCY_CODES, ISO_4217, NUMERIC_CURRENCY_CODES
 from .exceptions import *
+from .managers import MoneyQuerySet, prefetch_money
 
 
-__all__ = ['MoneyField', 'MoneyModelForm']
+__all__ = ['MoneyField', 'MoneyModelForm', 'BaseMoneyModelFormSet',
+           'moneymodelformset_factory']
 
 
-REGEX_CURRENCY_CODE = re.compile("^[A-Z]{3}$")
-def currency_code_validator(value):
-    if not REGEX_CURRENCY_CODE.match(force_text(value)):
-        raise ValidationError('Invalid currency code.')
+@deconstructible
+class CurrencyCodeValidator(object):
+    """
+    Validate ISO 4217 currency codes, alphabetic or numeric, or only the
+    given codes.
+    """
+    message = 'Invalid currency code.'
+    
+    def __init__(self, codes=None):
+        if codes is None:
+            self.codes = CURRENCY_CODES
+        else:
+            self.codes = frozenset(codes)
+    
+    def __call__(self, value):
+        try:
+            valid = value in self.codes
+        except TypeError:
+            valid = False
+        if not valid:
+            raise ValidationError(self.message)
+    
+    def __eq__(self, other):
+        return (isinstance(other, CurrencyCodeValidator) and
+                self.codes == other.codes)
+
+currency_code_validator = CurrencyCodeValidator()
 
 
 class MoneyModelFormMetaclass(ModelFormMetaclass):
@@ -42,42 +75,42 @@ class MoneyModelFormMetaclass(ModelFormMetaclass):
         # while preserving the original ordering.
         fields = SortedDict()
         for fieldname, field in new_class.base_fields.items():
-            for moneyfield in modelopts.moneyfields:
-                if fieldname == moneyfield.amount_attr:
-                    fields[moneyfield.name] = moneyfield.formfield()
-                    break
-                if fieldname == moneyfield.currency_attr:
-                    break
-            else:
+            moneyfield = modelopts.moneyfields_by_attr.get(fieldname)
+            if moneyfield is None:
                 fields[fieldname] = field
+            elif fieldname == moneyfield.amount_attr:
+                fields[moneyfield.name] = moneyfield.formfield()
         
         new_class.base_fields = fields
+        
+        # Money "subfields" cannot be excluded separately. Checked once here,
+        # reported when the form is instantiated.
+        exclude = new_class._meta.exclude or ()
+        new_class._partial_money_exclude = any(
+            (moneyfield.amount_attr in exclude) !=
+            (moneyfield.currency_attr in exclude)
+            for moneyfield in modelopts.moneyfields
+            if not moneyfield.fixed_currency
+        )
         return new_class
 
 
 class MoneyModelForm(forms.ModelForm, metaclass=MoneyModelFormMetaclass):
-    def __init__(self, *args, initial={}, instance=None, **kwargs):
-        opts = self._meta
-        modelopts = opts.model._meta
+    _partial_money_exclude = False
+    
+    def __init__(self, *args, initial=None, instance=None, **kwargs):
+        if self._partial_money_exclude:
+            msg = 'Cannot exclude only one money field from the model form.'
+            raise MoneyModelFormError(msg)
+        
+        initial = dict(initial or {})
         if instance:
             # Populate the multivalue form field using the initial dict,
             # as model_to_dict() only sees the model's _meta.fields
-            for moneyfield in modelopts.moneyfields:
-                initial.update({
-                    moneyfield.name: getattr(instance, moneyfield.name)}
-                )
+            for moneyfield in self._meta.model._meta.moneyfields:
+                initial[moneyfield.name] = getattr(instance, moneyfield.name)
         
         super().__init__(*args, initial=initial, instance=instance, **kwargs)
-        
-        # Money "subfields" cannot be excluded separately
-        if opts.exclude:
-            for moneyfield in modelopts.moneyfields:
-                if not moneyfield.fixed_currency:
-                    if not ((moneyfield.amount_attr in opts.exclude) == 
-                            (moneyfield.currency_attr in opts.exclude)):
-                        msg = ('Cannot exclude only one money field '
-                               'from the model form.')
-                        raise MoneyModelFormError(msg)
     
     def clean(self):
         cleaned_data = super().clean()
@@ -95,6 +128,72 @@ class MoneyModelForm(forms.ModelForm, metaclass=MoneyModelFormMetaclass):
         return cleaned_data
 
 
+class BaseMoneyModelFormSet(BaseModelFormSet):
+    """
+    Model formset saving all changed objects with one bulk UPDATE, all new
+    objects with one bulk INSERT and all deleted objects with one DELETE.
+    
+    Objects are saved without calling their save() method (and many to many
+    data is not saved), as with QuerySet.bulk_create(). Use commit=False to
+    save objects one by one.
+    """
+    def get_money_queryset(self):
+        return MoneyQuerySet(self.model, using=router.db_for_write(self.model))
+    
+    def save_existing_objects(self, commit=True):
+        if not commit:
+            return super().save_existing_objects(commit=False)
+        
+        self.changed_objects = []
+        self.deleted_objects = []
+        changed_fields = set()
+        forms_to_delete = self.deleted_forms
+        for form in self.initial_forms:
+            obj = form.instance
+            if form in forms_to_delete:
+                if obj.pk is not None:
+                    self.deleted_objects.append(obj)
+            elif form.has_changed():
+                self.changed_objects.append((obj, form.changed_data))
+                changed_fields.update(form.changed_data)
+        
+        queryset = self.get_money_queryset()
+        if self.deleted_objects:
+            queryset.filter(
+                pk__in=[obj.pk for obj in self.deleted_objects]
+            ).delete()
+        
+        saved_instances = [obj for obj, fields in self.changed_objects]
+        if saved_instances:
+            opts = self.model._meta
+            model_fields = set(field.name for field in opts.fields)
+            model_fields.update(field.name for field in opts.moneyfields)
+            queryset.bulk_update(saved_instances,
+                                 changed_fields & model_fields)
+        return saved_instances
+    
+    def save_new_objects(self, commit=True):
+        if not commit:
+            return super().save_new_objects(commit=False)
+        
+        self.new_objects = []
+        for form in self.extra_forms:
+            if not form.has_changed():
+                continue
+            if self.can_delete and self._should_delete_form(form):
+                continue
+            self.new_objects.append(form.instance)
+        if self.new_objects:
+            self.get_money_queryset().bulk_create(self.new_objects)
+        return self.new_objects
+
+
+def moneymodelformset_factory(model, form=MoneyModelForm,
+                              formset=BaseMoneyModelFormSet, **kwargs):
+    """Return a model formset class of MoneyModelForms"""
+    return modelformset_factory(model, form=form, formset=formset, **kwargs)
+
+
 class MoneyWidget(forms.MultiWidget):
     def decompress(self, value):
         if isinstance(value, Money):
@@ -122,6 +221,17 @@ class MoneyFormField(forms.MultiValueField):
     
     def compress(self, data_list):
         return Money(data_list[0], data_list[1])
+    
+    def __deepcopy__(self, memo):
+        # The subfields share their widgets with the MultiWidget (see
+        # MoneyField.formfield()). Keep sharing the copies instead of
+        # copying every widget twice on each form instantiation.
+        result = forms.Field.__deepcopy__(self, memo)
+        for field, widget in zip(self.fields, result.widget.widgets):
+            memo[id(field.widget)] = widget
+        result.fields = tuple(copy.deepcopy(field, memo)
+                              for field in self.fields)
+        return result
 
 
 class FixedCurrencyWidget(forms.Widget):
@@ -167,6 +277,10 @@ class AbstractMoneyProxy(object):
     def _get_values(self, obj):
         raise NotImplementedError()
     
+    def _load_deferred(self, obj):
+        # Load all deferred columns of the field at once
+        prefetch_money([obj], self.field.name)
+    
     def _set_values(self, obj, amount, currency):
         raise NotImplementedError()
     
@@ -177,24 +291,38 @@ class AbstractMoneyProxy(object):
         amount, currency = self._get_values(obj)
         if amount is None or currency is None:
             return None
-        return Money(amount, currency)
+        
+        # Reuse the Money object built on a previous access, as long as the
+        # underlying attributes have not been reassigned since.
+        cache = obj.__dict__.get(self.field.cache_attr)
+        if cache is not None and cache[0] is amount and cache[1] is currency:
+            return cache[2]
+        value = self.field.get_money(amount, currency)
+        obj.__dict__[self.field.cache_attr] = (amount, currency, value)
+        return value
     
     def __set__(self, obj, value):
         """Set amount and currency attributes in the model instance"""
         if isinstance(value, Money):
             self._set_values(obj, value.amount, value.currency)
-        elif isinstance(value, None):
+        elif value is None:
             self._set_values(obj, None, None)
         else:
             msg = 'Cannot assign "{}" to MoneyField "{}".'
             raise TypeError(msg.format(type(value), self.field.name))
+        obj.__dict__.pop(self.field.cache_attr, None)
 
 
 class SimpleMoneyProxy(AbstractMoneyProxy):
     """Descriptor for MoneyFields with fixed currency"""
     def _get_values(self, obj):
-        return (obj.__dict__[self.field.amount_attr],
-                self.field.fixed_currency)
+        try:
+            return (obj.__dict__[self.field.amount_attr],
+                    self.field.fixed_currency)
+        except KeyError:
+            self._load_deferred(obj)
+            return (getattr(obj, self.field.amount_attr),
+                    self.field.fixed_currency)
     
     def _set_values(self, obj, amount, currency=None):
         if not currency is None:
@@ -203,18 +331,26 @@ class SimpleMoneyProxy(AbstractMoneyProxy):
                     self.field.name, 
                     self.field.fixed_currency
                 ))
-        obj.__dict__[self.field.amount_attr] = amount
+        obj.__dict__[self.field.amount_attr] = (
+            self.field.amount_to_storage(self.field.quantize_amount(amount)))
 
 
 class CompositeMoneyProxy(AbstractMoneyProxy):
     """Descriptor for MoneyFields with variable currency"""
     def _get_values(self, obj):
-        return (obj.__dict__[self.field.amount_attr],
-                obj.__dict__[self.field.currency_attr])
+        try:
+            return (obj.__dict__[self.field.amount_attr],
+                    obj.__dict__[self.field.currency_attr])
+        except KeyError:
+            self._load_deferred(obj)
+            return (getattr(obj, self.field.amount_attr),
+                    getattr(obj, self.field.currency_attr))
     
     def _set_values(self, obj, amount, currency):
-        obj.__dict__[self.field.amount_attr] = amount
-        obj.__dict__[self.field.currency_attr] = currency
+        obj.__dict__[self.field.amount_attr] = (
+            self.field.amount_to_storage(self.field.quantize_amount(amount)))
+        obj.__dict__[self.field.currency_attr] = (
+            self.field.currency_to_storage(currency))
 
 
 class MoneyField(models.Field):
@@ -224,7 +360,15 @@ class MoneyField(models.Field):
                  max_digits=None, decimal_places=None,
                  currency=None, currency_choices=None,
                  currency_default=NOT_PROVIDED,
-                 default=NOT_PROVIDED, amount_default=NOT_PROVIDED, **kwargs):
+                 default=NOT_PROVIDED, amount_default=NOT_PROVIDED,
+                 storage='decimal', currency_storage='code',
+                 money_class=Money, quantize=False, **kwargs):
+        
+        # db_index='composite' indexes (currency, amount) together instead
+        # of indexing each column on its own
+        self.composite_index = kwargs.get('db_index') == 'composite'
+        if self.composite_index:
+            del kwargs['db_index']
         
         super().__init__(verbose_name, name, default=default, **kwargs)
         self.fixed_currency = currency
@@ -238,6 +382,41 @@ class MoneyField(models.Field):
             msg = ('"{}": MoneyFields require a positive integer '
                    'argument "max_digits".')
             raise FieldError(msg.format(self.name))
+        self.max_digits = max_digits
+        self.decimal_places = decimal_places
+        
+        # Quantize amounts to decimal_places when they are assigned, with
+        # a quantum and context built once per field
+        self.quantize = quantize
+        self.quantum = Decimal(1).scaleb(-decimal_places)
+        self.quantize_context = Context(prec=max_digits,
+                                        rounding=ROUND_HALF_EVEN)
+        
+        # Amount storage
+        if storage not in ('decimal', 'minor_units'):
+            msg = ('"{}": MoneyField "storage" must be "decimal" or '
+                   '"minor_units", it is "{}".')
+            raise FieldError(msg.format(self.name, storage))
+        self.minor_units = storage == 'minor_units'
+        if self.minor_units and max_digits > 18:
+            msg = ('"{}": MoneyFields stored in minor units allow up to 18 '
+                   '"max_digits".')
+            raise FieldError(msg.format(self.name))
+        
+        # Currency storage
+        if currency_storage not in ('code', 'numeric'):
+            msg = ('"{}": MoneyField "currency_storage" must be "code" or '
+                   '"numeric", it is "{}".')
+            raise FieldError(msg.format(self.name, currency_storage))
+        self.numeric_currency = currency_storage == 'numeric'
+        
+        # Type of the values returned by the model attribute
+        if not (isinstance(money_class, type) and
+                issubclass(money_class, Money)):
+            msg = ('"{}": MoneyField "money_class" must be a subclass of '
+                   'Money, it is "{}".')
+            raise FieldError(msg.format(self.name, money_class))
+        self.money_class = money_class
         
         # Currency must be either fixed or variable, not both.
         if currency and (currency_choices or currency_default != NOT_PROVIDED):
@@ -273,25 +452,69 @@ class MoneyField(models.Field):
                        'of type Money, it is "{}".')
                 raise TypeError(msg.format(self.name, type(currency)))
         
-        self.amount_field = models.DecimalField(
+        # The amount as a Decimal, also used to build form fields
+        self.amount_decimal_field = models.DecimalField(
             decimal_places=decimal_places,
             max_digits=max_digits,
             default=amount_default,
             **kwargs
         )
+        if self.minor_units:
+            # Integer amount, scaled by 10 ** decimal_places
+            if amount_default != NOT_PROVIDED:
+                amount_default = self.amount_to_storage(amount_default)
+            self.amount_field = models.BigIntegerField(
+                default=amount_default,
+                **kwargs
+            )
+        else:
+            self.amount_field = self.amount_decimal_field
+        if self.composite_index and self.fixed_currency:
+            # The amount is all there is to index
+            self.amount_field.db_index = True
+        
         if not self.fixed_currency:
             # This Moneyfield can have different currencies.
             # Add a currency column to the database
-            self.currency_field = models.CharField(
+            if currency_choices:
+                self.currency_validator = CurrencyCodeValidator(
+                    [code for code, label in currency_choices]
+                )
+            else:
+                self.currency_validator = currency_code_validator
+            self.currency_code_field = models.CharField(
                 max_length=3,
                 default=currency_default,
                 choices=currency_choices,
-                validators=[currency_code_validator],
+                validators=[self.currency_validator],
                 **kwargs
             )
+            if self.numeric_currency:
+                # ISO 4217 numeric code instead of the alphabetic code
+                if currency_default != NOT_PROVIDED:
+                    currency_default = self.currency_to_storage(
+                        currency_default)
+                numeric_validator = currency_code_validator
+                if currency_choices:
+                    currency_choices = [
+                        (self.currency_to_storage(code), label)
+                        for code, label in currency_choices
+                    ]
+                    numeric_validator = CurrencyCodeValidator(
+                        [code for code, label in currency_choices]
+                    )
+                self.currency_field = models.SmallIntegerField(
+                    default=currency_default,
+                    choices=currency_choices,
+                    validators=[numeric_validator],
+                    **kwargs
+                )
+            else:
+                self.currency_field = self.currency_code_field
     
     def contribute_to_class(self, cls, name):
         self.name = name
+        self.cache_attr = '_{}_cache'.format(name)
         
         self.amount_attr = '{}_amount'.format(name)
         cls.add_to_class(self.amount_attr, self.amount_field)
@@ -300,6 +523,16 @@ class MoneyField(models.Field):
             self.currency_attr = '{}_currency'.format(name)
             cls.add_to_class(self.currency_attr, self.currency_field)
             setattr(cls, name, CompositeMoneyProxy(self))
+            if self.composite_index:
+                index = (self.currency_attr, self.amount_attr)
+                cls._meta.index_together = (
+                    tuple(cls._meta.index_together) + (index,)
+                )
+                # Django >= 1.7 builds migrations from the Meta options
+                original_attrs = getattr(cls._meta, 'original_attrs', None)
+                if original_attrs is not None:
+                    original_attrs['index_together'] = (
+                        cls._meta.index_together)
         else:
             self.currency_attr = None
             setattr(cls, name, SimpleMoneyProxy(self))
@@ -308,13 +541,125 @@ class MoneyField(models.Field):
         # This will help identify which MoneyFields a model has
         if not hasattr(cls._meta, 'moneyfields'):
             cls._meta.moneyfields = []
+            cls._meta.moneyfields_by_attr = {}
         cls._meta.moneyfields.append(self)
+        
+        # Index MoneyFields by their amount and currency attribute names
+        cls._meta.moneyfields_by_attr[self.amount_attr] = self
+        if self.currency_attr:
+            cls._meta.moneyfields_by_attr[self.currency_attr] = self
+    
+    def amount_to_python(self, value):
+        """Return the Decimal amount for an amount column value"""
+        if self.minor_units and value is not None:
+            return Decimal(value).scaleb(-self.decimal_places)
+        return value
+    
+    def quantize_amount(self, amount):
+        """Return the amount rounded to decimal_places, if quantize=True"""
+        if not self.quantize or amount is None:
+            return amount
+        try:
+            return Decimal(amount).quantize(self.quantum,
+                                            context=self.quantize_context)
+        except InvalidOperation:
+            msg = 'MoneyField "{}" allows up to {} digits, got "{}".'
+            raise ValueError(msg.format(self.name, self.max_digits,
+                                        amount)) from None
+    
+    def amount_to_storage(self, amount):
+        """Return the amount column value for a Decimal amount"""
+        if self.minor_units and amount is not None:
+            units = Decimal(amount).scaleb(self.decimal_places)
+            if units != units.to_integral_value():
+                msg = ('MoneyField "{}" stores amounts with up to {} decimal '
+                       'places, got "{}".')
+                raise ValueError(msg.format(self.name, self.decimal_places,
+                                            amount))
+            return int(units)
+        return amount
+    
+    def currency_to_python(self, value):
+        """Return the currency code for a currency column value"""
+        if self.numeric_currency and value is not None:
+            try:
+                return NUMERIC_CURRENCY_CODES[value]
+            except KeyError:
+                msg = 'MoneyField "{}": unknown numeric currency code "{}".'
+                raise ValueError(msg.format(self.name, value)) from None
+        return value
+    
+    def currency_to_storage(self, currency):
+        """Return the currency column value for a currency code"""
+        if self.numeric_currency and currency is not None:
+            try:
+                return ISO_4217[currency]
+            except KeyError:
+                msg = 'MoneyField "{}": unknown currency code "{}".'
+                raise ValueError(msg.format(self.name, currency)) from None
+        return currency
+    
+    def get_money(self, amount, currency=None):
+        """Return a Money object from amount and currency column values"""
+        currency = self.fixed_currency or self.currency_to_python(currency)
+        if amount is None or currency is None:
+            return None
+        return self.money_class(self.amount_to_python(amount), currency)
+    
+    def get_column_values(self, value):
+        """Return a dict of column attribute names and values for Money"""
+        if isinstance(value, Money):
+            amount, currency = value.amount, value.currency
+        elif value is None:
+            amount, currency = None, None
+        else:
+            msg = 'Cannot assign "{}" to MoneyField "{}".'
+            raise TypeError(msg.format(type(value), self.name))
+        amount = self.quantize_amount(amount)
+        
+        if self.fixed_currency:
+            if not currency is None and currency != self.fixed_currency:
+                raise TypeError('Field "{}" is {}-only.'.format(
+                    self.name,
+                    self.fixed_currency
+                ))
+            return {self.amount_attr: self.amount_to_storage(amount)}
+        return {self.amount_attr: self.amount_to_storage(amount),
+                self.currency_attr: self.currency_to_storage(currency)}
+    
+    def to_python(self, value):
+        """Return Money from Money, None, or a string like "EUR 12.34\""""
+        if value is None or isinstance(value, Money):
+            return value
+        if value == '':
+            return None
+        try:
+            money = Money.loads(value)
+        except (ValueError, ArithmeticError, AttributeError):
+            msg = 'MoneyField "{}": invalid Money value "{}".'
+            raise ValidationError(msg.format(self.name, value))
+        if self.fixed_currency and money.currency != self.fixed_currency:
+            msg = 'MoneyField "{}" is {}-only, got "{}".'
+            raise ValidationError(msg.format(self.name, self.fixed_currency,
+                                             value))
+        return money
+    
+    def value_to_string(self, obj):
+        """Serialize the Money value of `obj` as a string like "EUR 12.34\""""
+        value = getattr(obj, self.name)
+        if value is None:
+            return ''
+        amount = value.amount
+        if amount.as_tuple().exponent > -self.decimal_places:
+            # Pad to decimal_places, as some backends drop trailing zeros
+            amount = amount.quantize(Decimal(1).scaleb(-self.decimal_places))
+        return '{} {}'.format(value.currency, amount)
     
     def formfield(self, **kwargs):
-        formfield_amount = self.amount_field.formfield()
+        formfield_amount = self.amount_decimal_field.formfield()
         if not self.fixed_currency:
-            formfield_currency = self.currency_field.formfield(
-                validators=[currency_code_validator]
+            formfield_currency = self.currency_code_field.formfield(
+                validators=[self.currency_validator]
             )
         else:
             formfield_currency = FixedCurrencyFormField(
@@ -0,0 +1,942 @@
+import copy
+import operator
+from collections import OrderedDict
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
+from functools import reduce
+
+from django.core.exceptions import FieldError
+from django.db import connections, models, router, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.fields import FieldDoesNotExist
+from django.db.models.query import EmptyQuerySet, QuerySet
+
+from money import Money
+
+
+__all__ = ['MoneyManager', 'MoneyQuerySet', 'MoneyWindow', 'prefetch_money']
+
+
+MONEY_LOOKUPS = ('exact', 'lt', 'lte', 'gt', 'gte', 'in', 'range',
+                 'isnull')
+
+
+if hasattr(transaction, 'atomic'):
+    def _atomic(using):
+        return transaction.atomic(using=using, savepoint=False)
+else:
+    # Django < 1.6
+    def _atomic(using):
+        return transaction.commit_on_success(using=using)
+
+
+def _check_money(field, value):
+    if not isinstance(value, Money):
+        msg = 'MoneyField "{}" lookups accept only Money, not "{}".'
+        raise TypeError(msg.format(field.name, type(value)))
+    if field.fixed_currency and value.currency != field.fixed_currency:
+        raise TypeError('Field "{}" is {}-only.'.format(
+            field.name,
+            field.fixed_currency
+        ))
+
+
+# Rounding of bounds between minor units, keeping the same matches
+_BOUND_ROUNDING = {
+    'lt': ROUND_CEILING,
+    'gte': ROUND_CEILING,
+    'lte': ROUND_FLOOR,
+    'gt': ROUND_FLOOR,
+}
+
+
+def _lookup_amount(field, amount, rounding=None):
+    """
+    Return the amount column value to compare with `amount`. With minor
+    units storage, bounds are rounded with `rounding`, and other amounts
+    with more decimal places than stored (which no value can equal) give
+    None.
+    """
+    if not field.minor_units:
+        return amount
+    units = Decimal(amount).scaleb(field.decimal_places)
+    if rounding is not None:
+        return int(units.to_integral_value(rounding=rounding))
+    if units != units.to_integral_value():
+        return None
+    return int(units)
+
+
+def _money_kwargs(field, currency, amount_lookup, amount):
+    """Return filter kwargs for an amount lookup scoped by currency"""
+    if amount_lookup == 'in':
+        amount = [value for value in
+                  (_lookup_amount(field, value) for value in amount)
+                  if value is not None]
+    elif amount_lookup == 'range':
+        low, high = amount
+        amount = (_lookup_amount(field, low, ROUND_CEILING),
+                  _lookup_amount(field, high, ROUND_FLOOR))
+    elif amount_lookup == 'exact':
+        amount = _lookup_amount(field, amount)
+        if amount is None:
+            # Matches nothing
+            amount_lookup, amount = 'in', []
+    else:
+        amount = _lookup_amount(field, amount, _BOUND_ROUNDING[amount_lookup])
+    kwargs = {LOOKUP_SEP.join([field.amount_attr, amount_lookup]): amount}
+    if not field.fixed_currency:
+        kwargs[field.currency_attr] = field.currency_to_storage(currency)
+    return kwargs
+
+
+def _isnull_q(field, isnull):
+    """Return a Q object for NULL (or not NULL) values of a MoneyField"""
+    q = Q(**{LOOKUP_SEP.join([field.amount_attr, 'isnull']): isnull})
+    if not field.fixed_currency:
+        # The value is None if either column is NULL
+        currency_q = Q(**{LOOKUP_SEP.join([field.currency_attr, 'isnull']):
+                          isnull})
+        q = q | currency_q if isnull else q & currency_q
+    return q
+
+
+def money_lookup_q(field, lookup_type, value):
+    """
+    Translate a lookup over a MoneyField into a Q object over its amount
+    and currency columns.
+    
+    Every predicate is an equality on the currency and a comparison on the
+    amount, so a (currency, amount) index can serve it.
+    """
+    if lookup_type not in MONEY_LOOKUPS:
+        msg = 'Unsupported lookup "{}" for MoneyField "{}".'
+        raise FieldError(msg.format(lookup_type, field.name))
+    
+    if lookup_type == 'isnull':
+        return _isnull_q(field, bool(value))
+    if lookup_type == 'exact' and value is None:
+        return _isnull_q(field, True)
+    
+    if lookup_type == 'in':
+        # Group the amounts by currency: one IN clause per currency
+        amounts = OrderedDict()
+        for money in value:
+            _check_money(field, money)
+            amounts.setdefault(money.currency, []).append(money.amount)
+        if not amounts:
+            return Q(**{LOOKUP_SEP.join([field.amount_attr, 'in']): []})
+        return reduce(operator.or_, [
+            Q(**_money_kwargs(field, currency, 'in', values))
+            for currency, values in amounts.items()
+        ])
+    
+    if lookup_type == 'range':
+        low, high = value
+        _check_money(field, low)
+        _check_money(field, high)
+        if low.currency != high.currency:
+            msg = 'Range bounds for MoneyField "{}" must share a currency.'
+            raise TypeError(msg.format(field.name))
+        return Q(**_money_kwargs(field, low.currency, 'range',
+                                 (low.amount, high.amount)))
+    
+    _check_money(field, value)
+    return Q(**_money_kwargs(field, value.currency, lookup_type,
+                             value.amount))
+
+
+def _to_decimal(value):
+    # Some backends return floats for aggregates such as Avg
+    if isinstance(value, float):
+        return Decimal(str(value))
+    return value
+
+
+def prefetch_money(instances, *names):
+    """
+    Load the deferred columns of MoneyFields `names` (by default all) of
+    model `instances`, with one query per model, database and batch,
+    instead of one query per instance on first access.
+    """
+    groups = OrderedDict()
+    for obj in instances:
+        model = obj._meta.concrete_model
+        db = obj._state.db or router.db_for_read(model)
+        groups.setdefault((model, db), []).append(obj)
+    
+    for (model, db), objs in groups.items():
+        moneyfields = getattr(model._meta, 'moneyfields', [])
+        if names:
+            moneyfields = [field for field in moneyfields
+                           if field.name in names]
+            if len(moneyfields) != len(set(names)):
+                msg = 'Model "{}" has no MoneyFields named {}.'
+                raise FieldError(msg.format(model.__name__, names))
+        attrs = []
+        for moneyfield in moneyfields:
+            attrs.append(moneyfield.amount_attr)
+            if moneyfield.currency_attr:
+                attrs.append(moneyfield.currency_attr)
+        
+        # Only instances with deferred columns, and only those columns
+        objs = [obj for obj in objs
+                if any(attr not in obj.__dict__ for attr in attrs)]
+        if not objs:
+            continue
+        columns = [attr for attr in attrs
+                   if any(attr not in obj.__dict__ for obj in objs)]
+        
+        connection = connections[db]
+        batch_size = max(connection.ops.bulk_batch_size(['pk'], objs), 1)
+        for start in range(0, len(objs), batch_size):
+            batch = objs[start:start + batch_size]
+            rows = model._base_manager.using(db).filter(
+                pk__in=[obj.pk for obj in batch]
+            ).values_list('pk', *columns)
+            values = {row[0]: row[1:] for row in rows}
+            for obj in batch:
+                row = values.get(obj.pk)
+                if row is None:
+                    continue
+                for attr, value in zip(columns, row):
+                    # Keep values assigned since the instance was loaded
+                    obj.__dict__.setdefault(attr, value)
+
+
+MONEY_ANNOTATION_LOOKUPS = {
+    'exact': '=',
+    'lt': '<',
+    'lte': '<=',
+    'gt': '>',
+    'gte': '>=',
+}
+
+
+def _decimal_cast_sql(amount):
+    sign, digits, exponent = amount.as_tuple()
+    places = max(-exponent, 0)
+    precision = max(len(digits) + max(exponent, 0), places, 1)
+    return 'CAST(%s AS DECIMAL({}, {}))'.format(precision, places)
+
+
+class MoneyWindow(object):
+    """
+    Window function over the amounts of MoneyField `name`, for
+    MoneyQuerySet.annotate_money_window(), e.g. a running total per currency:
+        
+        MoneyWindow('price', Sum, order_by=['date', 'pk'])
+    
+    `function` is an aggregate class (Sum, Avg, Min, Max) or an SQL function
+    name. Rows are partitioned by currency (required unless the currency is
+    fixed) and by the `partition_by` fields, and ordered by the `order_by`
+    fields ("-" for descending order) within each partition.
+    """
+    def __init__(self, name, function=Sum, partition_by_currency=True,
+                 partition_by=(), order_by=()):
+        self.name = name
+        self.function = getattr(function, 'name', function).upper()
+        self.partition_by_currency = partition_by_currency
+        self.partition_by = list(partition_by)
+        self.order_by = list(order_by)
+    
+    def as_sql(self, queryset):
+        moneyfield = queryset._get_moneyfield_or_error(self.name)
+        opts = queryset.model._meta
+        qn = connections[queryset.db].ops.quote_name
+        
+        def column(name):
+            field = opts.get_field(opts.pk.name if name == 'pk' else name)
+            return '{}.{}'.format(qn(opts.db_table), qn(field.column))
+        
+        partition = [column(name) for name in self.partition_by]
+        if not moneyfield.fixed_currency:
+            if not self.partition_by_currency:
+                msg = ('Window over MoneyField "{}" must be partitioned by '
+                       'currency, amounts in different currencies cannot be '
+                       'aggregated together.')
+                raise FieldError(msg.format(self.name))
+            partition.append(column(moneyfield.currency_attr))
+        
+        over = []
+        if partition:
+            over.append('PARTITION BY {}'.format(', '.join(partition)))
+        if self.order_by:
+            over.append('ORDER BY {}'.format(', '.join(
+                column(name[1:]) + ' DESC' if name.startswith('-')
+                else column(name) + ' ASC'
+                for name in self.order_by
+            )))
+        sql = '{}({}) OVER ({})'.format(self.function,
+                                        column(moneyfield.amount_attr),
+                                        ' '.join(over))
+        return sql, [], moneyfield
+
+
+class MoneyQuerySet(QuerySet):
+    """QuerySet accepting Money values in lookups over MoneyFields"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Extra selects returned as Money: {alias: (sql, params, currency,
+        # amount field)}, where currency is a code, or a MoneyField for its
+        # row currency, and values are converted like the amount field if
+        # it is not None
+        self._money_annotations = OrderedDict()
+        # MoneyFields of related models: {attribute: (moneyfield,
+        # amount field, currency field)}
+        self._related_money = OrderedDict()
+    
+    def _clone(self, *args, **kwargs):
+        clone = super()._clone(*args, **kwargs)
+        clone._money_annotations = self._money_annotations.copy()
+        clone._related_money = self._related_money.copy()
+        return clone
+    
+    def iterator(self):
+        if not self._money_annotations and not self._related_money:
+            yield from super().iterator()
+            return
+        annotations = [(alias, currency, amount_field)
+                       for alias, (sql, params, currency, amount_field)
+                       in self._money_annotations.items()]
+        # Extra selects skip the conversions of the backend (SQLite
+        # returns floats for decimal columns)
+        convert = connections[self.db].ops.convert_values
+        for obj in super().iterator():
+            for attr, (moneyfield, amount_field, currency_field) in (
+                    self._related_money.items()):
+                amount = getattr(obj, attr + '_amount')
+                if amount is not None:
+                    amount = convert(amount, amount_field)
+                    setattr(obj, attr + '_amount', amount)
+                currency = None
+                if currency_field is not None:
+                    currency = getattr(obj, attr + '_currency')
+                    if currency is not None:
+                        currency = convert(currency, currency_field)
+                        setattr(obj, attr + '_currency', currency)
+                setattr(obj, attr, moneyfield.get_money(amount, currency))
+            for alias, currency, amount_field in annotations:
+                value = getattr(obj, alias)
+                if value is None:
+                    continue
+                if amount_field is not None:
+                    value = convert(value, amount_field)
+                if isinstance(currency, str):
+                    value = Money(_to_decimal(value), currency)
+                else:
+                    row_currency = None
+                    if currency.currency_attr:
+                        row_currency = getattr(obj, currency.currency_attr)
+                    value = currency.get_money(_to_decimal(value),
+                                               row_currency)
+                setattr(obj, alias, value)
+            yield obj
+    
+    def _get_moneyfield(self, name):
+        for moneyfield in getattr(self.model._meta, 'moneyfields', []):
+            if moneyfield.name == name:
+                return moneyfield
+        return None
+    
+    def _get_moneyfield_or_error(self, name):
+        moneyfield = self._get_moneyfield(name)
+        if moneyfield is None:
+            msg = '"{}" is not a MoneyField of model "{}".'
+            raise FieldError(msg.format(name, self.model.__name__))
+        return moneyfield
+    
+    def _split_money_lookup(self, lookup):
+        parts = lookup.split(LOOKUP_SEP)
+        moneyfield = self._get_moneyfield(parts[0])
+        if moneyfield is None or len(parts) > 2:
+            return None, None
+        return moneyfield, (parts[1] if len(parts) == 2 else 'exact')
+    
+    def _expand_money_names(self, names):
+        expanded = []
+        for name in names:
+            moneyfield = None if name is None else self._get_moneyfield(name)
+            if moneyfield is None:
+                expanded.append(name)
+            else:
+                expanded.append(moneyfield.amount_attr)
+                if moneyfield.currency_attr:
+                    expanded.append(moneyfield.currency_attr)
+        return expanded
+    
+    def defer(self, *fields):
+        """Like QuerySet.defer(), deferring both columns of MoneyFields"""
+        return super().defer(*self._expand_money_names(fields))
+    
+    def only(self, *fields):
+        """Like QuerySet.only(), loading both columns of MoneyFields"""
+        return super().only(*self._expand_money_names(fields))
+    
+    def none(self):
+        if EmptyMoneyQuerySet is None:
+            return super().none()
+        # Django < 1.6
+        return self._clone(klass=EmptyMoneyQuerySet)
+    
+    def _expand_money_q(self, node):
+        if not isinstance(node, Q):
+            return node
+        clone = copy.copy(node)
+        clone.children = []
+        for child in node.children:
+            if isinstance(child, Q):
+                clone.children.append(self._expand_money_q(child))
+                continue
+            lookup, value = child
+            moneyfield, lookup_type = self._split_money_lookup(lookup)
+            if moneyfield is None:
+                clone.children.append(child)
+            else:
+                clone.children.append(
+                    money_lookup_q(moneyfield, lookup_type, value))
+        return clone
+    
+    def _money_annotation_where(self, lookup, value):
+        alias, _, lookup_type = lookup.partition(LOOKUP_SEP)
+        sql, params, currency, amount_field = self._money_annotations[alias]
+        if not isinstance(currency, str):
+            msg = 'Cannot filter on "{}", it is a window function.'
+            raise FieldError(msg.format(alias))
+        values = value if lookup_type == 'range' else [value]
+        for money in values:
+            if not isinstance(money, Money) or money.currency != currency:
+                msg = 'Lookups over "{}" accept only {} Money values.'
+                raise TypeError(msg.format(alias, currency))
+        # Decimal parameters are sent as strings by some backends (SQLite),
+        # so cast them to compare them as numbers
+        casts = [_decimal_cast_sql(money.amount) for money in values]
+        amounts = [money.amount for money in values]
+        if lookup_type == 'range':
+            sql = '({}) BETWEEN {} AND {}'.format(sql, *casts)
+            return sql, params + amounts
+        try:
+            comparison = MONEY_ANNOTATION_LOOKUPS[lookup_type or 'exact']
+        except KeyError:
+            msg = 'Unsupported lookup "{}" for "{}".'
+            raise FieldError(msg.format(lookup_type, alias)) from None
+        return '({}) {} {}'.format(sql, comparison, casts[0]), params + amounts
+    
+    def _filter_or_exclude(self, negate, *args, **kwargs):
+        args = [self._expand_money_q(arg) for arg in args]
+        where = []
+        where_params = []
+        for lookup in list(kwargs):
+            alias = lookup.split(LOOKUP_SEP)[0]
+            if alias in self._money_annotations:
+                if negate:
+                    msg = 'Cannot use "{}" in exclude().'
+                    raise FieldError(msg.format(alias))
+                sql, params = self._money_annotation_where(lookup,
+                                                           kwargs.pop(lookup))
+                where.append(sql)
+                where_params.extend(params)
+                continue
+            moneyfield, lookup_type = self._split_money_lookup(lookup)
+            if moneyfield is not None:
+                value = kwargs.pop(lookup)
+                args.append(money_lookup_q(moneyfield, lookup_type, value))
+        clone = super()._filter_or_exclude(negate, *args, **kwargs)
+        if where:
+            clone = clone.extra(where=where, params=where_params)
+        return clone
+    
+    def _amount_sql(self, moneyfield):
+        qn = connections[self.db].ops.quote_name
+        sql = '{}.{}'.format(
+            qn(self.model._meta.db_table),
+            qn(self.model._meta.get_field(moneyfield.amount_attr).column)
+        )
+        if moneyfield.minor_units:
+            scale = 10 ** moneyfield.decimal_places
+            sql = '({} * 1.0 / {})'.format(sql, scale)
+        return sql
+    
+    def annotate_money(self, alias, sql, params=(), currency=None):
+        """
+        Add an extra select `sql` to each object as attribute `alias`,
+        returned as Money in `currency`, or in the currency of each row if
+        `currency` is a MoneyField.
+        """
+        return self._annotate_money(alias, sql, params, currency)
+    
+    def _annotate_money(self, alias, sql, params, currency,
+                        amount_field=None):
+        clone = self.extra(select={alias: sql}, select_params=params)
+        clone._money_annotations[alias] = (sql, list(params), currency,
+                                           amount_field)
+        return clone
+    
+    def annotate_money_window(self, **windows):
+        """
+        Add MoneyWindow values as attributes, returned as Money in the
+        currency of each row.
+        
+        Window functions require PostgreSQL, MySQL 8, or SQLite 3.25.
+        """
+        clone = self
+        for alias, window in windows.items():
+            sql, params, moneyfield = window.as_sql(self)
+            amount_field = None
+            if window.function in ('SUM', 'MIN', 'MAX'):
+                # Same scale as the amount column: convert the values like
+                # it (SQLite returns floats, e.g. 0.30000000000000004)
+                amount_field = self.model._meta.get_field(
+                    moneyfield.amount_attr)
+            clone = clone._annotate_money(alias, sql, params, moneyfield,
+                                          amount_field)
+        return clone
+    
+    def annotate_converted(self, name, to, alias=None):
+        """
+        Add the value of MoneyField `name` converted to currency `to` as an
+        attribute (by default "<name>_<to>", e.g. "price_eur"), computed in
+        the database with the rates of the ExchangeRate table.
+        
+        The alias can be used to order (order_by('price_eur')) and filter
+        (filter(price_eur__lt=Money(...))) the queryset.
+        """
+        from .models import ExchangeRate
+        from .rates import get_base_currency
+        
+        moneyfield = self._get_moneyfield_or_error(name)
+        if moneyfield.numeric_currency:
+            msg = ('Cannot convert MoneyField "{}" in the database: it uses '
+                   'numeric currency codes.')
+            raise FieldError(msg.format(name))
+        if alias is None:
+            alias = '{}_{}'.format(name, to.lower())
+        
+        qn = connections[self.db].ops.quote_name
+        rate_opts = ExchangeRate._meta
+        rate_sql = 'SELECT {} FROM {} WHERE {} = {{}}'.format(
+            qn(rate_opts.get_field('rate').column),
+            qn(rate_opts.db_table),
+            qn(rate_opts.get_field('currency').column)
+        )
+        base = get_base_currency()
+        
+        # Quotation between the base currency and a currency: 1 for the
+        # base currency itself, which has no row in the ExchangeRate table
+        if moneyfield.fixed_currency:
+            currency_sql = '%s'
+            currency_params = [moneyfield.fixed_currency]
+        else:
+            currency_sql = '{}.{}'.format(
+                qn(self.model._meta.db_table),
+                qn(self.model._meta.get_field(moneyfield.currency_attr).column)
+            )
+            currency_params = []
+        origin_rate = 'CASE WHEN {0} = %s THEN 1 ELSE ({1}) END'.format(
+            currency_sql,
+            rate_sql.format(currency_sql)
+        )
+        origin_params = currency_params + [base] + currency_params
+        if to == base:
+            target_rate, target_params = '1', []
+        else:
+            target_rate = '({})'.format(rate_sql.format('%s'))
+            target_params = [to]
+        
+        # SQLite stores whole decimals as integers: "* 1.0" avoids an
+        # integer division
+        sql = '{} * {} * 1.0 / {}'.format(self._amount_sql(moneyfield),
+                                          target_rate, origin_rate)
+        return self.annotate_money(alias, sql, target_params + origin_params,
+                                   currency=to)
+    
+    def _get_related_moneyfield(self, lookup):
+        # Follow the foreign keys of `lookup` to its MoneyField, and return
+        # the related model and the MoneyField
+        names = lookup.split(LOOKUP_SEP)
+        model = self.model
+        for name in names[:-1]:
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                field = None
+            if not isinstance(field, models.ForeignKey):
+                msg = '"{}" is not a foreign key of model "{}".'
+                raise FieldError(msg.format(name, model.__name__))
+            model = field.rel.to
+        for moneyfield in getattr(model._meta, 'moneyfields', []):
+            if len(names) > 1 and moneyfield.name == names[-1]:
+                return model, moneyfield
+        msg = '"{}" is not a MoneyField of a related model.'
+        raise FieldError(msg.format(lookup))
+    
+    def _join_columns(self, lookups):
+        # Join the relations of `lookups` (LEFT OUTER JOIN when nullable)
+        # like values() does, and return "alias"."column" SQL for each
+        # lookup, leaving the selected columns of the query unchanged.
+        qn = connections[self.db].ops.quote_name
+        query = self.query
+        select = query.select
+        select_fields = getattr(query, 'select_fields', None)
+        query.select = []
+        try:
+            query.add_fields(lookups, allow_m2m=False)
+            # (alias, column) pairs, in SelectInfo tuples since Django 1.6
+            columns = [item[0] if isinstance(item[0], tuple) else item
+                       for item in query.select]
+        finally:
+            query.select = select
+            if select_fields is not None:
+                # Django < 1.6
+                query.select_fields = select_fields
+        return ['{}.{}'.format(qn(alias), qn(column))
+                for alias, column in columns]
+    
+    def with_related_money(self, *lookups):
+        """
+        Add MoneyFields of related models, following foreign keys like in
+        "product__price", as Money attributes named after the lookup
+        ("product_price"), without loading the related objects.
+        
+        The related tables are joined (LEFT OUTER JOIN for nullable foreign
+        keys), and the amount and currency columns are selected with the
+        rows of the queryset, as "<attribute>_amount" and
+        "<attribute>_currency".
+        """
+        clone = self._clone()
+        for lookup in lookups:
+            model, moneyfield = clone._get_related_moneyfield(lookup)
+            attr = lookup.replace(LOOKUP_SEP, '_')
+            prefix = lookup[:-len(moneyfield.name)]
+            opts = model._meta
+            amount_field = opts.get_field(moneyfield.amount_attr)
+            currency_field = None
+            fields = [amount_field]
+            if moneyfield.currency_attr:
+                currency_field = opts.get_field(moneyfield.currency_attr)
+                fields.append(currency_field)
+            columns = clone._join_columns([prefix + field.name
+                                           for field in fields])
+            select = OrderedDict(zip([attr + '_amount', attr + '_currency'],
+                                     columns))
+            clone = clone.extra(select=select)
+            clone._related_money[attr] = (moneyfield, amount_field,
+                                          currency_field)
+        return clone
+    
+    def _expand_money_values(self, kwargs):
+        values = {}
+        for name, value in kwargs.items():
+            moneyfield = self._get_moneyfield(name)
+            if moneyfield is None:
+                values[name] = value
+            else:
+                values.update(moneyfield.get_column_values(value))
+        return values
+    
+    def create(self, **kwargs):
+        return super().create(**self._expand_money_values(kwargs))
+    
+    def get_or_create(self, defaults=None, **kwargs):
+        if defaults is not None:
+            defaults = self._expand_money_values(defaults)
+        return super().get_or_create(
+            defaults=defaults,
+            **self._expand_money_values(kwargs)
+        )
+    
+    def update_or_create(self, defaults=None, **kwargs):
+        if defaults is not None:
+            defaults = self._expand_money_values(defaults)
+        kwargs = self._expand_money_values(kwargs)
+        if hasattr(QuerySet, 'update_or_create'):
+            return super().update_or_create(defaults=defaults, **kwargs)
+        
+        # Django < 1.7
+        defaults = defaults or {}
+        with _atomic(self.db):
+            obj, created = self.select_for_update().get_or_create(
+                defaults=defaults,
+                **kwargs
+            )
+            if not created:
+                for name, value in defaults.items():
+                    setattr(obj, name, value)
+                obj.save(using=self.db)
+        return obj, created
+    
+    def update(self, **kwargs):
+        return super().update(**self._expand_money_values(kwargs))
+    
+    def bulk_update(self, objs, fields, batch_size=None):
+        """
+        Save the given fields of model instances `objs` with one UPDATE
+        query per batch, setting each column with a CASE over the primary
+        key. MoneyFields update both their amount and currency columns.
+        
+        Return the number of rows updated.
+        """
+        opts = self.model._meta
+        columns = []
+        for name in fields:
+            moneyfield = self._get_moneyfield(name)
+            if moneyfield is None:
+                columns.append(opts.get_field(name))
+            else:
+                columns.append(opts.get_field(moneyfield.amount_attr))
+                if not moneyfield.fixed_currency:
+                    columns.append(opts.get_field(moneyfield.currency_attr))
+        objs = list(objs)
+        if not objs or not columns:
+            return 0
+        
+        self._for_write = True
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        pk = opts.pk
+        if batch_size is None:
+            # One "WHEN pk THEN value" pair per column, plus the pk in WHERE
+            params_per_obj = [pk] * (2 * len(columns) + 1)
+            batch_size = connection.ops.bulk_batch_size(params_per_obj, objs)
+        batch_size = max(batch_size, 1)
+        
+        # PostgreSQL cannot infer the type of CASE over parameters
+        placeholders = []
+        for column in columns:
+            if connection.vendor == 'postgresql':
+                placeholders.append(
+                    'CAST(%s AS {})'.format(column.db_type(connection)))
+            else:
+                placeholders.append('%s')
+        
+        updated = 0
+        with _atomic(self.db):
+            cursor = connection.cursor()
+            for start in range(0, len(objs), batch_size):
+                batch = objs[start:start + batch_size]
+                pks = [pk.get_db_prep_value(obj.pk, connection)
+                       for obj in batch]
+                assignments = []
+                params = []
+                for column, placeholder in zip(columns, placeholders):
+                    cases = []
+                    for obj_pk, obj in zip(pks, batch):
+                        cases.append('WHEN %s THEN {}'.format(placeholder))
+                        params.append(obj_pk)
+                        params.append(column.get_db_prep_save(
+                            getattr(obj, column.attname),
+                            connection=connection
+                        ))
+                    assignments.append('{} = CASE {} {} END'.format(
+                        qn(column.column),
+                        qn(pk.column),
+                        ' '.join(cases)
+                    ))
+                sql = 'UPDATE {} SET {} WHERE {} IN ({})'.format(
+                    qn(opts.db_table),
+                    ', '.join(assignments),
+                    qn(pk.column),
+                    ', '.join(['%s'] * len(pks))
+                )
+                cursor.execute(sql, params + pks)
+                updated += cursor.rowcount
+        return updated
+    
+    def _iter_money_rows(self, fields):
+        if not fields:
+            # All concrete fields, with money columns collapsed into
+            # their MoneyField, preserving the model ordering.
+            fields = []
+            moneyfields = getattr(self.model._meta, 'moneyfields', [])
+            for field in self.model._meta.fields:
+                for moneyfield in moneyfields:
+                    if field.attname == moneyfield.amount_attr:
+                        fields.append(moneyfield.name)
+                        break
+                    if field.attname == moneyfield.currency_attr:
+                        break
+                else:
+                    fields.append(field.attname)
+        
+        moneyfields = [self._get_moneyfield(name) for name in fields]
+        columns = []
+        for name, moneyfield in zip(fields, moneyfields):
+            if moneyfield is None:
+                columns.append(name)
+            elif moneyfield.fixed_currency:
+                columns.append(moneyfield.amount_attr)
+            else:
+                columns.extend([moneyfield.amount_attr,
+                                moneyfield.currency_attr])
+        
+        for row in self.values_list(*columns).iterator():
+            values = []
+            i = 0
+            for moneyfield in moneyfields:
+                if moneyfield is None:
+                    values.append(row[i])
+                    i += 1
+                elif moneyfield.fixed_currency:
+                    values.append(moneyfield.get_money(row[i]))
+                    i += 1
+                else:
+                    values.append(moneyfield.get_money(row[i], row[i + 1]))
+                    i += 2
+            yield fields, values
+    
+    def money_values(self, *fields):
+        """
+        Iterate over dicts, like values(), where MoneyFields are read
+        straight from their columns as Money objects. No model instances
+        are created.
+        """
+        for names, values in self._iter_money_rows(fields):
+            yield dict(zip(names, values))
+    
+    def money_values_list(self, *fields):
+        """Like money_values(), iterating over tuples"""
+        for names, values in self._iter_money_rows(fields):
+            yield tuple(values)
+    
+    def aggregate_money(self, name, aggregate=Sum):
+        """
+        Aggregate the amounts of MoneyField `name` (by default with Sum) in
+        a single query grouped by currency.
+        
+        Return an ordered dict of Money values keyed by currency. Amounts
+        without a currency are not aggregated.
+        """
+        moneyfield = self._get_moneyfield_or_error(name)
+        if moneyfield.fixed_currency:
+            result = self.aggregate(
+                amount=aggregate(moneyfield.amount_attr)
+            )['amount']
+            rows = [(moneyfield.fixed_currency, result)]
+        else:
+            rows = self.filter(**{
+                moneyfield.currency_attr + '__isnull': False,
+            }).values_list(
+                moneyfield.currency_attr
+            ).annotate(
+                amount=aggregate(moneyfield.amount_attr)
+            ).order_by(moneyfield.currency_attr)
+        
+        totals = OrderedDict()
+        for currency, amount in rows:
+            if amount is not None:
+                money = moneyfield.get_money(_to_decimal(amount), currency)
+                totals[money.currency] = money
+        return totals
+    
+    def money_histogram(self, name, buckets):
+        """
+        Count the values of MoneyField `name` in the ranges delimited by the
+        ascending amounts `buckets`, per currency, with a single query.
+        
+        Return an ordered dict keyed by currency of lists of (lower, upper,
+        count) tuples, one per bucket including empty ones: lower and upper
+        are Money bounds (lower <= value < upper), or None for the open
+        ranges below the first and above the last bound. NULL values are
+        not counted.
+        """
+        moneyfield = self._get_moneyfield_or_error(name)
+        bounds = [Decimal(str(bound)) if isinstance(bound, float)
+                  else Decimal(bound) for bound in buckets]
+        if bounds != sorted(bounds):
+            raise ValueError('Histogram bucket bounds must be ascending.')
+        
+        qn = connections[self.db].ops.quote_name
+        amount_sql = '{}.{}'.format(
+            qn(self.model._meta.db_table),
+            qn(self.model._meta.get_field(moneyfield.amount_attr).column)
+        )
+        whens = []
+        params = []
+        for index, bound in enumerate(bounds):
+            if moneyfield.minor_units:
+                bound = bound.scaleb(moneyfield.decimal_places)
+            whens.append('WHEN {} < {} THEN {}'.format(
+                amount_sql, _decimal_cast_sql(bound), index))
+            params.append(bound)
+        bucket_sql = 'CASE {} ELSE {} END'.format(' '.join(whens),
+                                                  len(bounds))
+        
+        # NULL values belong to no bucket
+        not_null = {moneyfield.amount_attr + '__isnull': False}
+        columns = ['money_bucket']
+        if not moneyfield.fixed_currency:
+            columns.insert(0, moneyfield.currency_attr)
+            not_null[moneyfield.currency_attr + '__isnull'] = False
+        rows = self.filter(**not_null).extra(
+            select={'money_bucket': bucket_sql},
+            select_params=params
+        ).values(*columns).annotate(count=Count('pk')).order_by()
+        
+        counts = {}
+        for row in rows:
+            currency = moneyfield.fixed_currency or (
+                moneyfield.currency_to_python(row[moneyfield.currency_attr]))
+            counts.setdefault(currency, [0] * (len(bounds) + 1))
+            counts[currency][int(row['money_bucket'])] = row['count']
+        
+        histogram = OrderedDict()
+        for currency in sorted(counts):
+            limits = [moneyfield.money_class(bound, currency)
+                      for bound in bounds]
+            lowers = [None] + limits
+            uppers = limits + [None]
+            histogram[currency] = list(zip(lowers, uppers, counts[currency]))
+        return histogram
+
+
+if issubclass(EmptyQuerySet, QuerySet):
+    # Django < 1.6: none() returns an EmptyQuerySet, without the methods
+    # of MoneyQuerySet
+    class EmptyMoneyQuerySet(EmptyQuerySet, MoneyQuerySet):
+        pass
+else:
+    EmptyMoneyQuerySet = None
+
+
+class MoneyManager(models.Manager):
+    """Manager for models with MoneyFields, see MoneyQuerySet"""
+    def get_queryset(self):
+        return MoneyQuerySet(self.model, using=self._db)
+    
+    # Django < 1.6
+    get_query_set = get_queryset
+    
+    def get_empty_query_set(self):
+        # Django < 1.6
+        return EmptyMoneyQuerySet(self.model, using=self._db)
+    
+    def update_or_create(self, *args, **kwargs):
+        # Django < 1.7
+        return self.get_queryset().update_or_create(*args, **kwargs)
+    
+    def bulk_update(self, *args, **kwargs):
+        return self.get_queryset().bulk_update(*args, **kwargs)
+    
+    def money_values(self, *args, **kwargs):
+        return self.get_queryset().money_values(*args, **kwargs)
+    
+    def money_values_list(self, *args, **kwargs):
+        return self.get_queryset().money_values_list(*args, **kwargs)
+    
+    def aggregate_money(self, *args, **kwargs):
+        return self.get_queryset().aggregate_money(*args, **kwargs)
+    
+    def money_histogram(self, *args, **kwargs):
+        return self.get_queryset().money_histogram(*args, **kwargs)
+    
+    def annotate_money(self, *args, **kwargs):
+        return self.get_queryset().annotate_money(*args, **kwargs)
+    
+    def annotate_converted(self, *args, **kwargs):
+        return self.get_queryset().annotate_converted(*args, **kwargs)
+    
+    def annotate_money_window(self, *args, **kwargs):
+        return self.get_queryset().annotate_money_window(*args, **kwargs)
+    
+    def with_related_money(self, *args, **kwargs):
+        return self.get_queryset().with_related_money(*args, **kwargs)
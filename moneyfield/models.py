@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.db import models
+
+from . import stats
+from .fields import currency_code_validator
+
+
+__all__ = ['ExchangeRate']
+
+
+class ExchangeRate(models.Model):
+    """
+    Exchange rate between the base currency (settings.MONEY_RATES_BASE) and
+    another currency, used by moneyfield.rates.DatabaseBackend.
+    """
+    currency = models.CharField(max_length=3, unique=True,
+                                validators=[currency_code_validator])
+    rate = models.DecimalField(max_digits=20, decimal_places=10)
+    
+    def __str__(self):
+        return '{} {}'.format(self.currency, self.rate)
+
+
+if getattr(settings, 'MONEY_STATS', False):
+    stats.install()
@@ -0,0 +1,117 @@
+"""
+Exchange rate backends for money.xrates, used by Money.to()
+"""
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from money import xrates
+from money.exchange import BackendBase
+
+
+__all__ = ['RatesBackend', 'LocalBackend', 'DatabaseBackend',
+           'get_base_currency', 'install', 'uninstall']
+
+
+DEFAULT_BACKEND = 'moneyfield.rates.DatabaseBackend'
+DEFAULT_TIMEOUT = 300
+
+
+def get_base_currency():
+    """Return the base currency of the ExchangeRate table"""
+    base = getattr(settings, 'MONEY_RATES_BASE', None)
+    if not base:
+        raise ImproperlyConfigured('Exchange rates require a base currency: '
+                                   'set MONEY_RATES_BASE.')
+    return base
+
+
+class RatesBackend(BackendBase):
+    """
+    Base exchange rates backend. Subclasses implement get_rates(), returning
+    a dict of rates between the base currency and other currencies.
+    """
+    def __init__(self, base=None):
+        self._base = base
+    
+    @property
+    def base(self):
+        return self._base
+    
+    @base.setter
+    def base(self, currency):
+        self._base = currency
+    
+    def get_rates(self):
+        raise NotImplementedError()
+    
+    def rate(self, currency):
+        if currency == self._base:
+            return Decimal(1)
+        return self.get_rates().get(currency)
+    
+    def quotation(self, origin, target):
+        return super().quotation(origin, target)
+
+
+class LocalBackend(RatesBackend):
+    """In-memory exchange rates"""
+    def __init__(self, base=None, rates=None):
+        super().__init__(base=base)
+        self._rates = dict(rates or {})
+    
+    def setrate(self, currency, rate):
+        self._rates[currency] = Decimal(rate)
+    
+    def get_rates(self):
+        return self._rates
+
+
+class DatabaseBackend(RatesBackend):
+    """
+    Exchange rates from the moneyfield.models.ExchangeRate table.
+    
+    The whole table is loaded in one query and kept in memory for `timeout`
+    seconds (settings.MONEY_RATES_TIMEOUT, 300 by default), so conversions
+    do not query the database each time.
+    """
+    def __init__(self, base=None, timeout=None):
+        super().__init__(base=base or get_base_currency())
+        if timeout is None:
+            timeout = getattr(settings, 'MONEY_RATES_TIMEOUT',
+                              DEFAULT_TIMEOUT)
+        self.timeout = timeout
+        self.clear()
+    
+    def clear(self):
+        """Discard the cached rates"""
+        self._rates = None
+        self._expires = 0
+    
+    def get_rates(self):
+        now = time.monotonic()
+        if self._rates is None or now >= self._expires:
+            from .models import ExchangeRate
+            self._rates = dict(
+                ExchangeRate.objects.values_list('currency', 'rate')
+            )
+            self._expires = now + self.timeout
+        return self._rates
+
+
+def install(backend=None):
+    """
+    Install an exchange rates backend in money.xrates, by default
+    settings.MONEY_RATES_BACKEND or DatabaseBackend.
+    """
+    if backend is None:
+        backend = getattr(settings, 'MONEY_RATES_BACKEND', DEFAULT_BACKEND)
+    xrates.install(backend)
+    return xrates._backend
+
+
+def uninstall():
+    """Uninstall any exchange rates backend from money.xrates"""
+    xrates.uninstall()
@@ -0,0 +1,141 @@
+"""
+JSON serializer writing each MoneyField as a single value, like
+"price": "EUR 12.34", instead of its amount and currency columns.
+Register it in settings:
+    
+    SERIALIZATION_MODULES = {'json': 'moneyfield.serializers'}
+
+Fixtures with separate amount and currency columns are still accepted.
+"""
+import json
+import sys
+from itertools import groupby
+
+from django.core.serializers import base
+from django.core.serializers import json as json_serializer
+from django.core.management.color import no_style
+from django.core.serializers.python import Deserializer as PythonDeserializer
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import six
+
+try:
+    from django.apps import apps
+    get_model = apps.get_model
+except ImportError:
+    # Django < 1.7
+    from django.db.models import get_model
+
+from .managers import _atomic
+
+__all__ = ['Serializer', 'Deserializer', 'load_fixture']
+
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class Serializer(json_serializer.Serializer):
+    """JSON serializer with MoneyFields as "<currency> <amount>" strings"""
+    def serialize(self, queryset, **options):
+        # Accept MoneyField names in "fields", selecting their columns
+        fields = options.get('fields')
+        if fields is not None:
+            opts = getattr(getattr(queryset, 'model', None), '_meta', None)
+            moneyfields = {moneyfield.name: moneyfield for moneyfield
+                           in getattr(opts, 'moneyfields', [])}
+            selected = []
+            for name in fields:
+                moneyfield = moneyfields.get(name)
+                if moneyfield is None:
+                    selected.append(name)
+                else:
+                    selected.append(moneyfield.amount_attr)
+            options['fields'] = selected
+        return super().serialize(queryset, **options)
+    
+    def handle_field(self, obj, field):
+        moneyfields = getattr(obj._meta, 'moneyfields_by_attr', {})
+        moneyfield = moneyfields.get(field.attname)
+        if moneyfield is None:
+            super().handle_field(obj, field)
+        elif field.attname == moneyfield.amount_attr:
+            self._current[moneyfield.name] = moneyfield.value_to_string(obj)
+
+
+def _expand_money(objects):
+    """Replace MoneyField values with their column values"""
+    for data in objects:
+        try:
+            model = get_model(*data['model'].split('.', 1))
+        except (KeyError, TypeError, LookupError):
+            model = None
+        fields = data.get('fields', {})
+        for moneyfield in getattr(model and model._meta, 'moneyfields', []):
+            if moneyfield.name in fields:
+                value = moneyfield.to_python(fields.pop(moneyfield.name))
+                fields.update(moneyfield.get_column_values(value))
+        yield data
+
+
+def Deserializer(stream_or_string, **options):
+    """Deserialize JSON with MoneyFields as "<currency> <amount>" strings"""
+    if not isinstance(stream_or_string, (bytes, six.string_types)):
+        stream_or_string = stream_or_string.read()
+    if isinstance(stream_or_string, bytes):
+        stream_or_string = stream_or_string.decode('utf-8')
+    try:
+        objects = json.loads(stream_or_string)
+        for obj in PythonDeserializer(_expand_money(objects), **options):
+            yield obj
+    except GeneratorExit:
+        raise
+    except Exception as e:
+        six.reraise(base.DeserializationError, base.DeserializationError(e),
+                    sys.exc_info()[2])
+
+
+def load_fixture(stream_or_string, batch_size=DEFAULT_BATCH_SIZE,
+                 using=DEFAULT_DB_ALIAS):
+    """
+    Load a JSON fixture with bulk_create(), in batches of `batch_size`
+    consecutive objects of the same model, instead of saving each object
+    like loaddata. Objects are saved without calling save() or sending
+    signals. Return the number of objects loaded.
+    
+    The fixture is loaded in a transaction, and the primary key sequences
+    of the models are reset afterwards, like loaddata.
+    """
+    count = 0
+    models = set()
+    with _atomic(using):
+        objects = Deserializer(stream_or_string, using=using)
+        for model, group in groupby(objects, lambda obj: type(obj.object)):
+            models.add(model)
+            batch = []
+            for deserialized in group:
+                batch.append(deserialized)
+                if len(batch) >= batch_size:
+                    count += _save_batch(model, batch, using)
+                    batch = []
+            if batch:
+                count += _save_batch(model, batch, using)
+        
+        if models:
+            connection = connections[using]
+            sequence_sql = connection.ops.sequence_reset_sql(no_style(),
+                                                             models)
+            if sequence_sql:
+                cursor = connection.cursor()
+                for sql in sequence_sql:
+                    cursor.execute(sql)
+    return count
+
+
+def _save_batch(model, batch, using):
+    model._base_manager.db_manager(using).bulk_create(
+        [deserialized.object for deserialized in batch]
+    )
+    for deserialized in batch:
+        m2m_data = deserialized.m2m_data or {}
+        for accessor_name, object_list in m2m_data.items():
+            setattr(deserialized.object, accessor_name, object_list)
+    return len(batch)
@@ -0,0 +1,140 @@
+"""
+Optional instrumentation of the MoneyField hot paths.
+
+install() wraps the model descriptors (get and set), MoneyFormField.compress,
+MoneyWidget.decompress and MoneyModelForm.clean to count calls and time them
+per field (or per form class), and uninstall() restores the original methods.
+Nothing is wrapped unless installed, so it costs nothing when disabled.
+
+Set settings.MONEY_STATS = True to install it at startup (this requires
+'moneyfield' in INSTALLED_APPS). Collected values are read with get_stats(),
+and each call also sends the `call_recorded` signal if it has receivers.
+"""
+import functools
+import threading
+import time
+
+from django.dispatch import Signal
+
+
+__all__ = ['call_recorded', 'install', 'uninstall', 'is_installed',
+           'get_stats', 'reset']
+
+
+# Upper bounds (in seconds) of the timing histogram buckets, plus one last
+# bucket for longer calls
+HISTOGRAM_BOUNDS = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1)
+
+call_recorded = Signal(providing_args=['operation', 'name', 'duration'])
+
+_lock = threading.Lock()
+_stats = {}
+_originals = []
+
+
+class _Stat(object):
+    __slots__ = ('count', 'time', 'histogram')
+    
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+    
+    def add(self, duration):
+        self.count += 1
+        self.time += duration
+        for index, bound in enumerate(HISTOGRAM_BOUNDS):
+            if duration < bound:
+                break
+        else:
+            index = len(HISTOGRAM_BOUNDS)
+        self.histogram[index] += 1
+
+
+def _record(operation, name, duration):
+    key = (operation, name)
+    with _lock:
+        stat = _stats.get(key)
+        if stat is None:
+            stat = _stats[key] = _Stat()
+        stat.add(duration)
+    if call_recorded.receivers:
+        call_recorded.send(sender=None, operation=operation, name=name,
+                           duration=duration)
+
+
+@functools.lru_cache(maxsize=None)
+def _field_label(model, field):
+    opts = model._meta
+    return '{}.{}.{}'.format(opts.app_label, opts.object_name, field.name)
+
+
+def _wrap(cls, attr, operation, get_name):
+    original = cls.__dict__[attr]
+    
+    @functools.wraps(original)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            _record(operation, get_name(self, *args),
+                    time.perf_counter() - start)
+    
+    _originals.append((cls, attr, original))
+    setattr(cls, attr, wrapper)
+
+
+def install():
+    """Start collecting stats. Does nothing if already installed."""
+    from .fields import (AbstractMoneyProxy, MoneyFormField, MoneyModelForm,
+                         MoneyWidget)
+    
+    if _originals:
+        return
+    _wrap(AbstractMoneyProxy, '__get__', 'get',
+          lambda proxy, obj, model: _field_label(model, proxy.field))
+    _wrap(AbstractMoneyProxy, '__set__', 'set',
+          lambda proxy, obj, value: _field_label(type(obj), proxy.field))
+    _wrap(MoneyFormField, 'compress', 'compress',
+          lambda formfield, data_list: None)
+    _wrap(MoneyWidget, 'decompress', 'decompress',
+          lambda widget, value: None)
+    _wrap(MoneyModelForm, 'clean', 'clean',
+          lambda form: '{}.{}'.format(type(form).__module__,
+                                      type(form).__name__))
+
+
+def uninstall():
+    """Stop collecting stats, restoring the original methods"""
+    while _originals:
+        cls, attr, original = _originals.pop()
+        setattr(cls, attr, original)
+
+
+def is_installed():
+    return bool(_originals)
+
+
+def get_stats():
+    """
+    Return a dict of collected stats keyed by (operation, name), where
+    operation is "get", "set", "compress", "decompress" or "clean", and name
+    is "<app_label>.<Model>.<field>" for descriptors, the form class path
+    for clean, and None for form fields and widgets.
+    
+    Each value is a dict with the number of calls ("count"), their total
+    time in seconds ("time"), and the number of calls in each bucket of
+    HISTOGRAM_BOUNDS ("histogram").
+    """
+    with _lock:
+        return {key: {'count': stat.count,
+                      'time': stat.time,
+                      'histogram': list(stat.histogram)}
+                for key, stat in _stats.items()}
+
+
+def reset():
+    """Discard the collected stats"""
+    with _lock:
+        _stats.clear()
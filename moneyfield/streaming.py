@@ -0,0 +1,259 @@
+"""
+Streaming export and import of models with MoneyFields, as CSV or JSON lines.
+
+Exports read the queryset in chunks ordered by primary key (keyset
+pagination: each chunk is a separate query starting after the last key),
+and rows are read with money_values(), without creating model instances.
+Imports create objects with bulk_create() in batches. Memory use depends
+on the chunk size, not on the size of the table.
+
+In both formats, each MoneyField is written as an amount and a currency:
+columns "<name>_amount" and "<name>_currency" in CSV, and an object
+{"amount": "12.34", "currency": "EUR"} in JSON lines.
+"""
+import csv
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router
+from django.db.models.fields import FieldDoesNotExist
+
+from money import Money
+
+from .managers import MoneyQuerySet
+
+
+__all__ = ['iter_money_values', 'export_csv', 'export_jsonl',
+           'import_csv', 'import_jsonl']
+
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def _get_fields(model, fields):
+    """Return field names, by default all with money columns collapsed"""
+    if fields:
+        return list(fields)
+    money_attrs = getattr(model._meta, 'moneyfields_by_attr', {})
+    names = []
+    for field in model._meta.fields:
+        moneyfield = money_attrs.get(field.attname)
+        if moneyfield is None:
+            names.append(field.attname)
+        elif moneyfield.name not in names:
+            names.append(moneyfield.name)
+    return names
+
+
+def _get_moneyfields(model):
+    return {moneyfield.name: moneyfield
+            for moneyfield in getattr(model._meta, 'moneyfields', [])}
+
+
+def _format_amount(moneyfield, amount):
+    # Some backends drop trailing zeros from decimal columns
+    return str(amount.quantize(Decimal(1).scaleb(-moneyfield.decimal_places)))
+
+
+def iter_money_values(queryset, fields=(), chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Iterate over the money_values() dicts of `queryset`, reading it in
+    chunks of `chunk_size` rows ordered by primary key.
+    """
+    queryset = queryset._clone(klass=MoneyQuerySet).order_by('pk')
+    fields = _get_fields(queryset.model, fields)
+    pk_name = queryset.model._meta.pk.attname
+    columns = fields if pk_name in fields else fields + [pk_name]
+    
+    last_pk = None
+    while True:
+        chunk = queryset
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        rows = list(chunk[:chunk_size].money_values(*columns))
+        for row in rows:
+            last_pk = row[pk_name] if pk_name in fields else row.pop(pk_name)
+            yield row
+        if len(rows) < chunk_size:
+            break
+
+
+def export_csv(queryset, stream, fields=(), chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Write `fields` (by default all) of `queryset` to the text `stream` as
+    CSV with a header row. Return the number of rows written.
+    """
+    fields = _get_fields(queryset.model, fields)
+    moneyfields = _get_moneyfields(queryset.model)
+    header = []
+    for name in fields:
+        if name in moneyfields:
+            header.extend(['{}_amount'.format(name),
+                           '{}_currency'.format(name)])
+        else:
+            header.append(name)
+    
+    writer = csv.writer(stream)
+    writer.writerow(header)
+    count = 0
+    for row in iter_money_values(queryset, fields, chunk_size):
+        values = []
+        for name in fields:
+            value = row[name]
+            if name in moneyfields:
+                values.extend(['', ''] if value is None else [
+                    _format_amount(moneyfields[name], value.amount),
+                    value.currency
+                ])
+            else:
+                values.append('' if value is None else value)
+        writer.writerow(values)
+        count += 1
+    return count
+
+
+def export_jsonl(queryset, stream, fields=(), chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Write `fields` (by default all) of `queryset` to the text `stream` as
+    JSON lines, one object per row. Return the number of rows written.
+    """
+    moneyfields = _get_moneyfields(queryset.model)
+    encoder = DjangoJSONEncoder()
+    count = 0
+    for row in iter_money_values(queryset, fields, chunk_size):
+        for name, value in row.items():
+            if isinstance(value, Money):
+                row[name] = {
+                    'amount': _format_amount(moneyfields[name], value.amount),
+                    'currency': value.currency,
+                }
+        stream.write(encoder.encode(row))
+        stream.write('\n')
+        count += 1
+    return count
+
+
+def _import(model, rows, chunk_size, using):
+    """
+    Create objects of `model` from dicts of field names and values, where
+    MoneyFields are (amount, currency) pairs, with bulk_create() batches.
+    """
+    using = using or router.db_for_write(model)
+    moneyfields = _get_moneyfields(model)
+    # Columns are named after the attnames, e.g. "product_id"
+    fields = {}
+    for field in model._meta.fields:
+        fields[field.name] = field
+        fields[field.attname] = field
+    count = 0
+    batch = []
+    currencies = {}
+    
+    def flush():
+        # Validate each currency code once per batch and field
+        for moneyfield, codes in currencies.items():
+            for code in codes:
+                moneyfield.currency_validator(code)
+        model._default_manager.db_manager(using).bulk_create(batch)
+        del batch[:]
+        currencies.clear()
+    
+    for line, row in enumerate(rows, 1):
+        kwargs = {}
+        for name, value in row.items():
+            moneyfield = moneyfields.get(name)
+            if moneyfield is None:
+                try:
+                    field = fields[name]
+                except KeyError:
+                    msg = '{} has no field named "{}".'
+                    raise FieldDoesNotExist(msg.format(
+                        model._meta.object_name, name)) from None
+                if value == '' and field.null:
+                    value = None
+                kwargs[field.attname] = field.to_python(value)
+                continue
+            
+            amount, currency = value
+            if amount in (None, '') and currency in (None, ''):
+                money = None
+            else:
+                currency = currency or moneyfield.fixed_currency
+                try:
+                    money = Money(Decimal(amount), currency)
+                except ArithmeticError:
+                    msg = 'Line {}: invalid amount "{}" for "{}".'
+                    raise ValidationError(msg.format(line, amount, name))
+                if not moneyfield.fixed_currency:
+                    currencies.setdefault(moneyfield, set()).add(currency)
+            kwargs.update(moneyfield.get_column_values(money))
+        batch.append(model(**kwargs))
+        count += 1
+        if len(batch) >= chunk_size:
+            flush()
+    if batch:
+        flush()
+    return count
+
+
+def _iter_csv_rows(model, stream):
+    moneyfields = _get_moneyfields(model)
+    reader = csv.reader(stream)
+    header = next(reader)
+    money_columns = {}
+    for name in moneyfields:
+        amount_column = '{}_amount'.format(name)
+        currency_column = '{}_currency'.format(name)
+        if amount_column in header:
+            money_columns[name] = (
+                header.index(amount_column),
+                header.index(currency_column)
+                if currency_column in header else None
+            )
+    money_indexes = set()
+    for indexes in money_columns.values():
+        money_indexes.update(indexes)
+    plain_columns = [(i, name) for i, name in enumerate(header)
+                     if i not in money_indexes]
+    
+    for values in reader:
+        row = {name: values[i] for i, name in plain_columns}
+        for name, (amount_index, currency_index) in money_columns.items():
+            row[name] = (
+                values[amount_index],
+                None if currency_index is None else values[currency_index]
+            )
+        yield row
+
+
+def _iter_jsonl_rows(model, stream):
+    moneyfields = _get_moneyfields(model)
+    for line in stream:
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        for name in moneyfields:
+            if name in row:
+                value = row[name] or {}
+                row[name] = (value.get('amount'), value.get('currency'))
+        yield row
+
+
+def import_csv(model, stream, chunk_size=DEFAULT_CHUNK_SIZE, using=None):
+    """
+    Create objects of `model` from CSV written by export_csv(), with
+    bulk_create() batches of `chunk_size` objects. Return the number of
+    objects created.
+    """
+    return _import(model, _iter_csv_rows(model, stream), chunk_size, using)
+
+
+def import_jsonl(model, stream, chunk_size=DEFAULT_CHUNK_SIZE, using=None):
+    """
+    Create objects of `model` from JSON lines written by export_jsonl(),
+    with bulk_create() batches of `chunk_size` objects. Return the number
+    of objects created.
+    """
+    return _import(model, _iter_jsonl_rows(model, stream), chunk_size, using)
@@ -0,0 +1,237 @@
+"""
+Columnar Money values with NumPy, for analytics over many rows.
+
+A MoneyVector holds amounts as int64 integers scaled by `decimal_places`
+(e.g. EUR 12.34 is 1234 with 2 decimal places), and currencies as an int16
+array of indexes into a tuple of currency codes. Operations run on the
+arrays, and Money objects are only created when reading values out.
+
+Requires NumPy.
+"""
+from array import array
+from collections import OrderedDict
+from decimal import ROUND_HALF_EVEN, Decimal
+
+import numpy
+from django.core.exceptions import FieldError
+
+from money import Money, xrates
+
+
+__all__ = ['MoneyVector']
+
+
+INT64_MAX = 2 ** 63 - 1
+
+# Largest integer up to which every integer is exact as a float64
+FLOAT64_EXACT_MAX = 2 ** 53
+
+
+def _max_abs(amounts):
+    # As a Python int: numpy.abs() overflows on the int64 minimum
+    if not len(amounts):
+        return 0
+    return max(int(amounts.max()), -int(amounts.min()))
+
+
+def _round_half_even(amounts, factor):
+    """Divide int64 `amounts` by `factor`, rounding half to even"""
+    quotients, remainders = numpy.divmod(amounts, factor)
+    half = factor // 2
+    round_up = (remainders > half) | (
+        (remainders == half) & (quotients % 2 == 1)
+    )
+    return quotients + round_up
+
+
+class MoneyVector(object):
+    """
+    Vector of Money values, stored as scaled int64 amounts and categorical
+    currency codes.
+    """
+    def __init__(self, amounts, codes, currencies, decimal_places):
+        self.amounts = numpy.asarray(amounts, dtype=numpy.int64)
+        self.codes = numpy.asarray(codes, dtype=numpy.int16)
+        self.currencies = tuple(currencies)
+        self.decimal_places = decimal_places
+        if self.amounts.shape != self.codes.shape:
+            raise ValueError('Amounts and currency codes must have the same '
+                             'length.')
+    
+    @classmethod
+    def from_money(cls, values, decimal_places=2):
+        """Return a MoneyVector from an iterable of Money objects"""
+        amounts = array('q')
+        codes = array('h')
+        categories = OrderedDict()
+        for value in values:
+            units = value.amount.scaleb(decimal_places)
+            if units != units.to_integral_value():
+                msg = 'Cannot store "{}" with {} decimal places.'
+                raise ValueError(msg.format(value, decimal_places))
+            amounts.append(int(units))
+            codes.append(categories.setdefault(value.currency,
+                                               len(categories)))
+        return cls(numpy.frombuffer(amounts, dtype=numpy.int64),
+                   numpy.frombuffer(codes, dtype=numpy.int16),
+                   categories, decimal_places)
+    
+    @classmethod
+    def from_queryset(cls, queryset, name):
+        """
+        Return a MoneyVector with the values of MoneyField `name` in
+        `queryset`, read with values_list() and without creating model
+        instances or Money objects. NULL values are not supported.
+        """
+        moneyfield = None
+        for field in getattr(queryset.model._meta, 'moneyfields', []):
+            if field.name == name:
+                moneyfield = field
+        if moneyfield is None:
+            msg = '"{}" is not a MoneyField of model "{}".'
+            raise FieldError(msg.format(name, queryset.model.__name__))
+        
+        decimal_places = moneyfield.decimal_places
+        amounts = array('q')
+        codes = array('h')
+        if moneyfield.fixed_currency:
+            categories = {moneyfield.fixed_currency: 0}
+            rows = queryset.values_list(moneyfield.amount_attr, flat=True)
+            for amount in rows.iterator():
+                amounts.append(cls._scale(moneyfield, amount))
+        else:
+            # Keyed by column value, which may be a numeric currency code
+            categories = OrderedDict()
+            rows = queryset.values_list(moneyfield.amount_attr,
+                                        moneyfield.currency_attr)
+            for amount, currency in rows.iterator():
+                amounts.append(cls._scale(moneyfield, amount))
+                codes.append(categories.setdefault(currency, len(categories)))
+        currencies = [moneyfield.fixed_currency or
+                      moneyfield.currency_to_python(currency)
+                      for currency in categories]
+        amounts = numpy.frombuffer(amounts, dtype=numpy.int64)
+        if moneyfield.fixed_currency:
+            codes = numpy.zeros(len(amounts), dtype=numpy.int16)
+        else:
+            codes = numpy.frombuffer(codes, dtype=numpy.int16)
+        return cls(amounts, codes, currencies, decimal_places)
+    
+    @staticmethod
+    def _scale(moneyfield, amount):
+        if amount is None:
+            msg = 'MoneyField "{}" has NULL amounts: filter them out first.'
+            raise ValueError(msg.format(moneyfield.name))
+        if moneyfield.minor_units:
+            return amount
+        return int(Decimal(amount).scaleb(moneyfield.decimal_places)
+                   .to_integral_value())
+    
+    def __len__(self):
+        return len(self.amounts)
+    
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+    
+    def __getitem__(self, index):
+        amount = Decimal(int(self.amounts[index]))
+        return Money(amount.scaleb(-self.decimal_places),
+                     self.currencies[self.codes[index]])
+    
+    def __repr__(self):
+        return '<MoneyVector: {} values in {}>'.format(
+            len(self), ', '.join(self.currencies)
+        )
+    
+    def to_money(self):
+        """Return a list of Money objects"""
+        return list(self)
+    
+    def group_by_currency(self):
+        """Return an OrderedDict of MoneyVectors, one per currency"""
+        groups = OrderedDict()
+        for code, currency in enumerate(self.currencies):
+            mask = self.codes == code
+            if mask.any():
+                groups[currency] = MoneyVector(
+                    self.amounts[mask],
+                    numpy.zeros(numpy.count_nonzero(mask), dtype=numpy.int16),
+                    [currency],
+                    self.decimal_places
+                )
+        return groups
+    
+    def sum(self):
+        """Return an OrderedDict of Money totals, one per currency"""
+        totals = OrderedDict()
+        for code, currency in enumerate(self.currencies):
+            mask = self.codes == code
+            if mask.any():
+                amounts = self.amounts[mask]
+                if _max_abs(amounts) * len(amounts) > INT64_MAX:
+                    # The int64 sum could overflow: add Python ints
+                    total = Decimal(int(amounts.astype(object).sum()))
+                else:
+                    total = Decimal(int(amounts.sum()))
+                totals[currency] = Money(total.scaleb(-self.decimal_places),
+                                         currency)
+        return totals
+    
+    def round(self, decimal_places):
+        """
+        Return a MoneyVector with amounts rounded to `decimal_places`,
+        rounding half to even.
+        """
+        if decimal_places >= self.decimal_places:
+            factor = 10 ** (decimal_places - self.decimal_places)
+            if _max_abs(self.amounts) * factor > INT64_MAX:
+                msg = 'Amounts with {} decimal places overflow int64.'
+                raise ValueError(msg.format(decimal_places))
+            amounts = self.amounts * factor
+        else:
+            factor = 10 ** (self.decimal_places - decimal_places)
+            amounts = _round_half_even(self.amounts, factor)
+        return MoneyVector(amounts, self.codes, self.currencies,
+                           decimal_places)
+    
+    def convert(self, currency, rates=None):
+        """
+        Return a MoneyVector with all amounts converted to `currency`.
+        
+        `rates` is a dict of quotations from each currency to `currency`,
+        by default taken from money.xrates. Amounts are multiplied as
+        float64 and rounded half to even to `decimal_places`. Currencies
+        with converted amounts beyond 2**53 units, where float64 cannot
+        represent every unit, are converted exactly with Decimal instead.
+        """
+        converted = numpy.zeros(len(self), dtype=numpy.int64)
+        for code, origin in enumerate(self.currencies):
+            mask = self.codes == code
+            if not mask.any():
+                continue
+            if origin == currency:
+                rate = 1
+            elif rates is not None:
+                rate = rates[origin]
+            else:
+                rate = xrates.quotation(origin, currency)
+            if rate is None:
+                msg = 'Unknown exchange rate from {} to {}.'
+                raise ValueError(msg.format(origin, currency))
+            amounts = self.amounts[mask]
+            limit = _max_abs(amounts) * abs(Decimal(str(rate)))
+            if limit > INT64_MAX:
+                msg = 'Amounts converted from {} to {} overflow int64.'
+                raise ValueError(msg.format(origin, currency))
+            if limit < FLOAT64_EXACT_MAX:
+                converted[mask] = numpy.rint(amounts * float(rate))
+            else:
+                rate = Decimal(str(rate))
+                converted[mask] = [
+                    int((amount * rate).to_integral_value(ROUND_HALF_EVEN))
+                    for amount in amounts.astype(object)
+                ]
+        return MoneyVector(converted,
+                           numpy.zeros(len(self), dtype=numpy.int16),
+                           [currency], self.decimal_places)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+"""
+Benchmarks for MoneyField hot paths, using the testapp models and SQLite.
+
+Results are written as JSON, one entry per benchmark, model and row count:
+    
+    python tests/benchmarks.py --rows 100 1000 --output results.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from decimal import Decimal
+
+
+MODELS = ['FreeCurrencyModel', 'FixedCurrencyModel', 'SomeMoney']
+
+BENCHMARKS = []
+
+
+def benchmark(func):
+    BENCHMARKS.append(func)
+    return func
+
+
+def setup_django():
+    pkg_path = os.path.normpath(
+        os.path.join(os.path.abspath(os.path.dirname(__file__)), os.pardir)
+    )
+    if pkg_path not in sys.path:
+        sys.path.insert(0, pkg_path)
+    
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.settings')
+    import django
+    if hasattr(django, 'setup'):
+        django.setup()
+    
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def get_moneyfield(model):
+    return model._meta.moneyfields[0]
+
+
+def make_instances(model, rows):
+    moneyfield = get_moneyfield(model)
+    objs = []
+    for i in range(rows):
+        obj = model()
+        obj.__dict__[moneyfield.amount_attr] = Decimal(i) / 100
+        if not moneyfield.fixed_currency:
+            obj.__dict__[moneyfield.currency_attr] = 'EUR'
+        objs.append(obj)
+    return objs
+
+
+def get_form_class(model):
+    from django.forms.models import modelform_factory
+    from moneyfield import MoneyModelForm
+    return modelform_factory(model, form=MoneyModelForm, exclude=())
+
+
+def get_form_data(model):
+    moneyfield = get_moneyfield(model)
+    data = {'{}_0'.format(moneyfield.name): '1234.00'}
+    if not moneyfield.fixed_currency:
+        data['{}_1'.format(moneyfield.name)] = 'EUR'
+    return data
+
+
+@benchmark
+def descriptor_get(model, rows):
+    # Cold reads: the cached Money value is dropped before each read, so
+    # every read builds a new Money from the column values
+    objs = make_instances(model, rows)
+    moneyfield = get_moneyfield(model)
+    name = moneyfield.name
+    cache_attr = moneyfield.cache_attr
+    def run():
+        for obj in objs:
+            obj.__dict__.pop(cache_attr, None)
+            getattr(obj, name)
+    return run
+
+
+@benchmark
+def descriptor_get_cached(model, rows):
+    # Warm reads, returning the cached Money value of each instance
+    objs = make_instances(model, rows)
+    name = get_moneyfield(model).name
+    for obj in objs:
+        getattr(obj, name)
+    def run():
+        for obj in objs:
+            getattr(obj, name)
+    return run
+
+
+@benchmark
+def descriptor_set(model, rows):
+    from money import Money
+    objs = make_instances(model, rows)
+    name = get_moneyfield(model).name
+    value = Money('1234.00', 'EUR')
+    def run():
+        for obj in objs:
+            setattr(obj, name, value)
+    return run
+
+
+@benchmark
+def model_init(model, rows):
+    moneyfield = get_moneyfield(model)
+    kwargs = {moneyfield.amount_attr: Decimal('1234.00')}
+    if not moneyfield.fixed_currency:
+        kwargs[moneyfield.currency_attr] = 'EUR'
+    def run():
+        for i in range(rows):
+            model(**kwargs)
+    return run
+
+
+@benchmark
+def queryset_iteration(model, rows):
+    model.objects.all().delete()
+    model.objects.bulk_create(make_instances(model, rows))
+    name = get_moneyfield(model).name
+    def run():
+        for obj in model.objects.all():
+            getattr(obj, name)
+    return run
+
+
+@benchmark
+def bulk_create(model, rows):
+    objs = make_instances(model, rows)
+    def run():
+        model.objects.all().delete()
+        model.objects.bulk_create(objs)
+    return run
+
+
+@benchmark
+def form_init(model, rows):
+    Form = get_form_class(model)
+    objs = make_instances(model, rows)
+    def run():
+        for obj in objs:
+            Form(instance=obj)
+    return run
+
+
+@benchmark
+def form_validation(model, rows):
+    Form = get_form_class(model)
+    data = get_form_data(model)
+    def run():
+        for i in range(rows):
+            Form(data=data).is_valid()
+    return run
+
+
+@benchmark
+def form_rendering(model, rows):
+    Form = get_form_class(model)
+    forms = [Form(instance=obj) for obj in make_instances(model, rows)]
+    def run():
+        for form in forms:
+            form.as_p()
+    return run
+
+
+def run_benchmarks(names, models, row_counts, repeat):
+    import testapp.models as testmodels
+    results = []
+    for func in BENCHMARKS:
+        if names and func.__name__ not in names:
+            continue
+        for model_name in models:
+            model = getattr(testmodels, model_name)
+            for rows in row_counts:
+                run = func(model, rows)
+                timings = []
+                for i in range(repeat):
+                    start = time.perf_counter()
+                    run()
+                    timings.append(time.perf_counter() - start)
+                best = min(timings)
+                results.append({
+                    'benchmark': func.__name__,
+                    'model': model_name,
+                    'rows': rows,
+                    'repeat': repeat,
+                    'seconds': best,
+                    'usec_per_row': best / rows * 1e6,
+                })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('benchmarks', nargs='*',
+                        help='Benchmarks to run (default: all)')
+    parser.add_argument('--models', nargs='+', default=MODELS)
+    parser.add_argument('--rows', nargs='+', type=int,
+                        default=[100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='JSON file (default: stdout)')
+    args = parser.parse_args()
+    
+    setup_django()
+    results = run_benchmarks(args.benchmarks, args.models, args.rows,
+                             args.repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
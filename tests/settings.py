@@ -9,6 +9,7 @@ USE_L10N = True
 SECRET_KEY = "justthetestapp"
 
 INSTALLED_APPS = (
+    'moneyfield',
     'testapp',
 )
 
@@ -16,4 +17,6 @@ MONEY_CURRENCY_CHOICES = (
     ('AAA', 'AAA'),
     ('BBB', 'BBB'),
     ('CCC', 'CCC'),
-)
\ No newline at end of file
+)
+
+MONEY_RATES_BASE = 'EUR'
\ No newline at end of file
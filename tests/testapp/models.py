@@ -1,6 +1,6 @@
 from decimal import Decimal
 from django.db import models
-from moneyfield import MoneyField
+from moneyfield import MoneyField, MoneyManager, CompactMoney
 
 
 class DummyModel(models.Model):
@@ -64,4 +64,102 @@ class SomeMoney(models.Model):
     field3 = models.CharField(blank=True, max_length=100)
 
 
+class FreeCurrencyManagerModel(models.Model):
+    name = models.CharField(blank=True, max_length=100)
+    price = MoneyField(decimal_places=2, max_digits=12)
+    
+    objects = MoneyManager()
+
+
+class FixedCurrencyManagerModel(models.Model):
+    name = models.CharField(blank=True, max_length=100)
+    price = MoneyField(decimal_places=2, max_digits=12, currency='EUR')
+    
+    objects = MoneyManager()
+
+
+class FreeCurrencyIndexModel(models.Model):
+    name = models.CharField(blank=True, max_length=100)
+    price = MoneyField(decimal_places=2, max_digits=12, db_index='composite')
+
+
+class FixedCurrencyIndexModel(models.Model):
+    name = models.CharField(blank=True, max_length=100)
+    price = MoneyField(decimal_places=2, max_digits=12, currency='EUR',
+                       db_index='composite')
+
+
+class MinorUnitsModel(models.Model):
+    name = models.CharField(blank=True, max_length=100)
+    price = MoneyField(decimal_places=2, max_digits=12, storage='minor_units')
+    
+    objects = MoneyManager()
+
+
+class FixedCurrencyMinorUnitsModel(models.Model):
+    name = models.CharField(blank=True, max_length=100)
+    price = MoneyField(decimal_places=2, max_digits=12, currency='EUR',
+                       amount_default=Decimal('1234.00'),
+                       storage='minor_units')
+    
+    objects = MoneyManager()
+
+
+class NumericCurrencyModel(models.Model):
+    CURRENCY_CHOICES = (
+        ('EUR', 'EUR'),
+        ('USD', 'USD'),
+        ('CNY', 'CNY'),
+    )
+    CURRENCY_DEFAULT = 'EUR'
+    
+    name = models.CharField(blank=True, max_length=100)
+    price = MoneyField(decimal_places=2, max_digits=12,
+                       currency_choices=CURRENCY_CHOICES,
+                       currency_default=CURRENCY_DEFAULT,
+                       currency_storage='numeric')
+    
+    objects = MoneyManager()
+
+
+class CompactMoneyModel(models.Model):
+    name = models.CharField(blank=True, max_length=100)
+    price = MoneyField(decimal_places=2, max_digits=12,
+                       money_class=CompactMoney)
+    
+    objects = MoneyManager()
+
+
+class QuantizedModel(models.Model):
+    name = models.CharField(blank=True, max_length=100)
+    price = MoneyField(decimal_places=2, max_digits=6, quantize=True)
+    
+    objects = MoneyManager()
+
+
+class QuantizedMinorUnitsModel(models.Model):
+    name = models.CharField(blank=True, max_length=100)
+    price = MoneyField(decimal_places=2, max_digits=6, currency='EUR',
+                       storage='minor_units', quantize=True)
+
+
+class NullableMoneyModel(models.Model):
+    name = models.CharField(blank=True, max_length=100)
+    price = MoneyField(decimal_places=2, max_digits=12, null=True)
+    
+    objects = MoneyManager()
+
 
+class RelatedMoneyModel(models.Model):
+    name = models.CharField(blank=True, max_length=100)
+    product = models.ForeignKey(FreeCurrencyManagerModel, null=True)
+    fixed_product = models.ForeignKey(FixedCurrencyManagerModel, null=True)
+    minor_units_product = models.ForeignKey(MinorUnitsModel, null=True)
+    
+    objects = MoneyManager()
+
+
+class NestedRelatedMoneyModel(models.Model):
+    parent = models.ForeignKey(RelatedMoneyModel)
+    
+    objects = MoneyManager()
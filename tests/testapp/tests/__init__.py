@@ -1,2 +1,9 @@
 from .test_forms import *
-from .test_models import *
\ No newline at end of file
+from .test_models import *
+from .test_querysets import *
+from .test_rates import *
+from .test_vector import *
+from .test_streaming import *
+from .test_serializers import *
+from .test_stats import *
+from .test_aio import *
@@ -0,0 +1,163 @@
+import asyncio
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from decimal import Decimal
+from unittest import mock
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TestCase
+
+from money import Money
+
+from moneyfield import aio
+from testapp.models import FreeCurrencyManagerModel, FreeCurrencyModel
+
+
+class InlineExecutor(Executor):
+    """Run calls in the current thread, sharing its test database"""
+    def __init__(self):
+        self.calls = 0
+    
+    def submit(self, function, *args, **kwargs):
+        self.calls += 1
+        future = Future()
+        try:
+            future.set_result(function(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class TestAsyncHelpers(TestCase):
+    model = FreeCurrencyManagerModel
+    
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.executor = InlineExecutor()
+        for amount, currency in [('1.00', 'EUR'), ('2.00', 'EUR'),
+                                 ('3.50', 'USD')]:
+            self.model.objects.create(name=currency,
+                                      price=Money(amount, currency))
+    
+    def tearDown(self):
+        self.loop.close()
+    
+    def run_coroutine(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+    
+    def test_aget(self):
+        queryset = self.model.objects.only('name')
+        obj = self.run_coroutine(aio.aget(queryset, name='USD',
+                                          executor=self.executor))
+        self.assertEqual(self.executor.calls, 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(obj.price, Money('3.50', 'USD'))
+    
+    def test_aget_money_lookup(self):
+        FreeCurrencyModel.objects.create(price_amount=Decimal('4.00'),
+                                         price_currency='GBP')
+        obj = self.run_coroutine(aio.aget(
+            FreeCurrencyModel.objects, price=Money('4.00', 'GBP'),
+            executor=self.executor))
+        self.assertEqual(obj.price, Money('4.00', 'GBP'))
+    
+    def test_aaggregate_money(self):
+        queryset = self.model.objects.filter(price_currency='EUR')
+        total = self.run_coroutine(aio.aaggregate_money(
+            queryset, 'price', executor=self.executor))
+        self.assertEqual(total, self.model.objects.filter(
+            price_currency='EUR').aggregate_money('price'))
+        self.assertEqual(self.executor.calls, 1)
+    
+    def test_abulk_update(self):
+        objs = list(self.model.objects.filter(price_currency='EUR'))
+        for obj in objs:
+            obj.price = obj.price * 2
+        self.run_coroutine(aio.abulk_update(self.model.objects, objs,
+                                            ['price'], executor=self.executor))
+        self.assertEqual(self.executor.calls, 1)
+        self.assertEqual(
+            sorted(self.model.objects.filter(
+                price_currency='EUR').values_list('price_amount', flat=True)),
+            [Decimal('2.00'), Decimal('4.00')]
+        )
+    
+    def test_aiter_money_values(self):
+        iterator = aio.aiter_money_values(self.model.objects.all(),
+                                          ['name', 'price'], chunk_size=2,
+                                          executor=self.executor)
+        
+        @asyncio.coroutine
+        def read_all():
+            rows = []
+            while True:
+                row = yield from iterator.__anext__()
+                rows.append(row)
+        
+        with self.assertRaises(aio.StopAsyncIteration):
+            self.run_coroutine(read_all())
+        self.assertEqual(self.executor.calls, 2)
+    
+    def test_read_chunks(self):
+        iterator = aio.aiter_money_values(FreeCurrencyModel.objects.none(),
+                                          executor=self.executor)
+        self.assertEqual(self.run_coroutine(iterator.read()), [])
+        iterator = aio.aiter_money_values(self.model.objects.all(),
+                                          ['price'], chunk_size=2,
+                                          executor=self.executor)
+        self.assertEqual(self.run_coroutine(iterator.read()), [
+            {'price': Money('1.00', 'EUR')},
+            {'price': Money('2.00', 'EUR')},
+        ])
+        self.assertEqual(self.run_coroutine(iterator.read()), [
+            {'price': Money('3.50', 'USD')},
+        ])
+        self.assertEqual(self.run_coroutine(iterator.read()), [])
+        self.assertEqual(self.executor.calls, 3)
+
+
+class TestThreadedExecutor(TestCase):
+    model = FreeCurrencyManagerModel
+    
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        # Share the test database connection with the worker thread
+        connection = connections[DEFAULT_DB_ALIAS]
+        connection.allow_thread_sharing = True
+        
+        def share_connection():
+            connections[DEFAULT_DB_ALIAS] = connection
+            return threading.current_thread()
+        
+        self.worker = self.executor.submit(share_connection).result()
+        self.model.objects.create(name='EUR', price=Money('1.00', 'EUR'))
+    
+    def tearDown(self):
+        self.executor.shutdown()
+        self.loop.close()
+        connections[DEFAULT_DB_ALIAS].allow_thread_sharing = False
+    
+    def test_close_old_connections(self):
+        threads = []
+        close_old_connections = aio.close_old_connections
+        
+        def record_close():
+            threads.append(threading.current_thread())
+            close_old_connections()
+        
+        with mock.patch.object(aio, 'close_old_connections', record_close):
+            total = self.loop.run_until_complete(aio.aaggregate_money(
+                self.model.objects.all(), 'price', executor=self.executor))
+        self.assertEqual(total, {'EUR': Money('1.00', 'EUR')})
+        self.assertEqual(threads, [self.worker, self.worker])
+    
+    def test_close_old_connections_on_error(self):
+        calls = []
+        with mock.patch.object(aio, 'close_old_connections',
+                               lambda: calls.append(None)):
+            with self.assertRaises(self.model.DoesNotExist):
+                self.loop.run_until_complete(aio.aget(
+                    self.model.objects.all(), name='USD',
+                    executor=self.executor))
+        self.assertEqual(len(calls), 2)
@@ -1,5 +1,7 @@
 from decimal import Decimal
 
+from django import forms
+from django.db import router
 from django.forms.models import modelform_factory
 from django.test import TestCase
 
@@ -7,10 +9,11 @@ from money import Money
 
 from moneyfield.exceptions import *
 from moneyfield.fields import MoneyFormField
-from moneyfield import MoneyField, MoneyModelForm
+from moneyfield import MoneyField, MoneyModelForm, moneymodelformset_factory
 
 from testapp.models import (DummyModel, FixedCurrencyModel, FreeCurrencyModel,
-                            ChoicesCurrencyModel, SomeMoney)
+                            ChoicesCurrencyModel, SomeMoney, MinorUnitsModel,
+                            NumericCurrencyModel)
 
 
 class TestMoneyModelFormOrdering(TestCase):
@@ -19,6 +22,36 @@ class TestMoneyModelFormOrdering(TestCase):
         self.assertEqual(list(form.fields.keys()), ['field1', 'field2', 'field3'])
 
 
+class TestMoneyModelFormFields(TestCase):
+    def test_moneyfields_by_attr(self):
+        opts = SomeMoney._meta
+        self.assertEqual(opts.moneyfields_by_attr, {
+            'field2_amount': opts.moneyfields[0],
+            'field2_currency': opts.moneyfields[0],
+        })
+    
+    def test_form_field_copy_shares_widgets(self):
+        form = modelform_factory(ChoicesCurrencyModel, form=MoneyModelForm)()
+        field = form.fields['price']
+        base_field = form.base_fields['price']
+        self.assertIsNot(field, base_field)
+        self.assertIsNot(field.widget, base_field.widget)
+        for subfield, widget in zip(field.fields, field.widget.widgets):
+            self.assertIs(subfield.widget, widget)
+        self.assertEqual(field.fields[1].choices, base_field.fields[1].choices)
+    
+    def test_initial_not_modified(self):
+        Form = modelform_factory(FreeCurrencyModel, form=MoneyModelForm)
+        initial = {'name': 'Name'}
+        instance = FreeCurrencyModel(price_amount=Decimal('1.00'),
+                                     price_currency='EUR')
+        form = Form(initial=initial, instance=instance)
+        self.assertEqual(initial, {'name': 'Name'})
+        self.assertEqual(form.initial['price'], Money('1.00', 'EUR'))
+        form = Form()
+        self.assertNotIn('price', form.initial)
+
+
 class TestMoneyModelFormValidation(TestCase):
     def test_model_without_moneyfields(self):
         with self.assertRaises(MoneyModelFormError):
@@ -178,3 +211,129 @@ class TestChoicesCurrencyMoneyModelForm(MoneyModelFormMixin, TestCase):
 
 
 
+
+
+class TestMinorUnitsMoneyModelForm(MoneyModelFormMixin, TestCase):
+    def setUp(self):
+        self.Form = modelform_factory(MinorUnitsModel, form=MoneyModelForm)
+    
+    def test_initial(self):
+        obj = MinorUnitsModel(price_amount=123400, price_currency='USD')
+        html = self.Form(instance=obj).as_p()
+        self.assertIn('value="1234.00"', html)
+        self.assertIn('value="USD"', html)
+    
+    def test_amount_form_field(self):
+        form = self.Form()
+        self.assertIsInstance(form.fields['price'].fields[0],
+                              forms.DecimalField)
+
+
+class TestNumericCurrencyMoneyModelForm(MoneyModelFormMixin, TestCase):
+    def setUp(self):
+        self.Form = modelform_factory(NumericCurrencyModel,
+                                      form=MoneyModelForm)
+    
+    def test_initial(self):
+        form = self.Form(initial={
+            'price': Money('1234.00', 'USD'),
+        })
+        html = form.as_p()
+        self.assertIn('value="1234.00"', html)
+        self.assertIn('value="USD" selected="selected"', html)
+    
+    def test_data_saved_as_numeric_code(self):
+        form = self.Form(data={
+            'price_0': Decimal('1234.00'),
+            'price_1': 'USD',
+        })
+        obj = form.save()
+        self.assertEqual(obj.price_currency, 840)
+
+
+class TestMoneyModelFormSet(TestCase):
+    def setUp(self):
+        self.FormSet = moneymodelformset_factory(
+            FreeCurrencyModel, exclude=(), extra=1, can_delete=True
+        )
+        for i in range(3):
+            FreeCurrencyModel.objects.create(
+                name=str(i),
+                price_amount=Decimal(i),
+                price_currency='EUR'
+            )
+        self.objs = list(FreeCurrencyModel.objects.order_by('pk'))
+    
+    def get_data(self):
+        data = {
+            'form-TOTAL_FORMS': '4',
+            'form-INITIAL_FORMS': '3',
+            'form-MAX_NUM_FORMS': '',
+        }
+        for i, obj in enumerate(self.objs):
+            data.update({
+                'form-{}-id'.format(i): str(obj.pk),
+                'form-{}-name'.format(i): obj.name,
+                'form-{}-price_0'.format(i): str(obj.price_amount),
+                'form-{}-price_1'.format(i): obj.price_currency,
+            })
+        return data
+    
+    def test_save(self):
+        data = self.get_data()
+        data.update({
+            'form-0-price_0': '10.00',
+            'form-0-price_1': 'USD',
+            'form-1-name': 'changed',
+            'form-2-DELETE': 'on',
+            'form-3-name': 'new',
+            'form-3-price_0': '5.00',
+            'form-3-price_1': 'GBP',
+        })
+        formset = self.FormSet(data, queryset=FreeCurrencyModel.objects.all())
+        self.assertTrue(formset.is_valid())
+        formset.save()
+        self.assertEqual(len(formset.changed_objects), 2)
+        self.assertEqual(len(formset.deleted_objects), 1)
+        self.assertEqual(len(formset.new_objects), 1)
+        
+        rows = [(obj.name, obj.price) for obj in
+                FreeCurrencyModel.objects.order_by('pk')]
+        self.assertEqual(rows, [
+            ('0', Money('10.00', 'USD')),
+            ('changed', Money('1.00', 'EUR')),
+            ('new', Money('5.00', 'GBP')),
+        ])
+    
+    def test_save_write_database(self):
+        class ReplicaRouter(object):
+            def db_for_read(self, model, **hints):
+                return 'replica'
+            
+            def db_for_write(self, model, **hints):
+                return 'default'
+        
+        formset = self.FormSet(queryset=FreeCurrencyModel.objects.all())
+        routers = router.routers
+        router.routers = [ReplicaRouter()]
+        try:
+            self.assertEqual(formset.get_money_queryset().db, 'default')
+        finally:
+            router.routers = routers
+    
+    def test_invalid_currency(self):
+        data = self.get_data()
+        data['form-1-price_1'] = 'ZZZ'
+        formset = self.FormSet(data, queryset=FreeCurrencyModel.objects.all())
+        self.assertFalse(formset.is_valid())
+        self.assertIn('price', formset.errors[1])
+    
+    def test_save_commit_false(self):
+        data = self.get_data()
+        data['form-0-name'] = 'changed'
+        formset = self.FormSet(data, queryset=FreeCurrencyModel.objects.all())
+        self.assertTrue(formset.is_valid())
+        instances = formset.save(commit=False)
+        self.assertEqual([obj.name for obj in instances], ['changed'])
+        self.assertFalse(FreeCurrencyModel.objects.filter(
+            name='changed').exists())
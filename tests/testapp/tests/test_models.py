@@ -1,5 +1,10 @@
+import copy
+import io
+import pickle
+import unittest
 from decimal import Decimal
 
+from django.core import management
 from django.db import connection
 from django.db.utils import DatabaseError
 from django.core.exceptions import FieldError, ValidationError
@@ -7,9 +12,22 @@ from django.test import TestCase
 
 from money import Money
 
-from moneyfield import MoneyField
+from moneyfield import MoneyField, CompactMoney
+from moneyfield.fields import CurrencyCodeValidator, currency_code_validator
 import testapp.models as testmodels
 
+try:
+    from django.db.migrations.writer import MigrationWriter
+except ImportError:
+    # Django < 1.7
+    MigrationWriter = None
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python < 3.4
+    tracemalloc = None
+
 
 class TestFieldValidation(TestCase):
     def test_missing_decimal_places(self):
@@ -91,6 +109,49 @@ class TestFieldValidation(TestCase):
             )
 
 
+class TestCurrencyCodeValidator(TestCase):
+    def test_valid_codes(self):
+        currency_code_validator('EUR')
+        currency_code_validator('XAU')
+        currency_code_validator(978)
+    
+    def test_invalid_codes(self):
+        for value in ['ZZZ', 'eur', 'EURO', '', None, 1, ['EUR']]:
+            with self.assertRaises(ValidationError):
+                currency_code_validator(value)
+    
+    def test_restricted_codes(self):
+        validator = CurrencyCodeValidator(['EUR', 'USD'])
+        validator('USD')
+        with self.assertRaises(ValidationError):
+            validator('GBP')
+    
+    def test_equality(self):
+        self.assertEqual(CurrencyCodeValidator(), currency_code_validator)
+        self.assertEqual(CurrencyCodeValidator(['EUR', 'USD']),
+                         CurrencyCodeValidator(['USD', 'EUR']))
+        self.assertNotEqual(CurrencyCodeValidator(['EUR']),
+                            currency_code_validator)
+    
+    @unittest.skipIf(MigrationWriter is None, 'requires Django 1.7')
+    def test_serialize(self):
+        for model in [testmodels.FreeCurrencyModel,
+                      testmodels.ChoicesCurrencyModel,
+                      testmodels.NumericCurrencyModel]:
+            field = model._meta.get_field('price_currency')
+            string, imports = MigrationWriter.serialize(field)
+            self.assertIn('moneyfield.fields.CurrencyCodeValidator(', string)
+            self.assertIn('import moneyfield.fields', imports)
+    
+    @unittest.skipIf(MigrationWriter is None, 'requires Django 1.7')
+    def test_makemigrations(self):
+        stdout = io.StringIO()
+        management.call_command('makemigrations', 'testapp', 'moneyfield',
+                                dry_run=True, verbosity=3, stdout=stdout)
+        self.assertIn("CurrencyCodeValidator(['EUR', 'USD', 'CNY'])",
+                      stdout.getvalue())
+
+
 class TestMoneyFieldMixin(object):
     def setUp(self):
         self.table_name = self.model._meta.db_table
@@ -141,6 +202,29 @@ class TestMoneyFieldMixin(object):
         obj.save()
         self.assertEqual(obj.price, Money('0.99', 'EUR'))
     
+    def test_instance_descriptor_set_none(self):
+        obj = self.manager_create_instance()
+        obj.price = None
+        self.assertIsNone(obj.price)
+    
+    def test_instance_descriptor_cached(self):
+        obj = self.manager_create_instance()
+        self.assertIs(obj.price, obj.price)
+    
+    def test_instance_descriptor_cache_invalidated_by_set(self):
+        obj = self.manager_create_instance()
+        cached = obj.price
+        obj.price = Money('0.99', 'EUR')
+        self.assertIsNot(obj.price, cached)
+        self.assertEqual(obj.price, Money('0.99', 'EUR'))
+    
+    def test_instance_descriptor_cache_invalidated_by_amount(self):
+        obj = self.manager_create_instance()
+        cached = obj.price
+        obj.price_amount = Decimal('0.99')
+        self.assertIsNot(obj.price, cached)
+        self.assertEqual(obj.price, Money('0.99', 'EUR'))
+    
     def test_instance_descriptor_incomplete_only_amount(self):
         obj = self.model()
         obj.price_amount = Decimal('1234.00')
@@ -226,6 +310,13 @@ class TestFreeCurrencyMoneyField(TestMoneyFieldMixin, TestCase):
         obj = self.manager_create_instance()
         self.assertEqual(obj.price_currency, 'EUR')
     
+    def test_instance_descriptor_cache_invalidated_by_currency(self):
+        obj = self.manager_create_instance()
+        cached = obj.price
+        obj.price_currency = 'USD'
+        self.assertIsNot(obj.price, cached)
+        self.assertEqual(obj.price, Money('1234.00', 'USD'))
+    
     def test_query_currency(self):
         obj = self.manager_create_instance()
         results = self.model.objects.filter(price_currency='EUR')
@@ -241,6 +332,9 @@ class TestFreeCurrencyMoneyField(TestMoneyFieldMixin, TestCase):
         obj.price_currency = "123"
         with self.assertRaises(ValidationError):
             obj.full_clean()
+        obj.price_currency = "ZZZ"
+        with self.assertRaises(ValidationError):
+            obj.full_clean()
 
 
 class TestFreeCurrencyDefaultAmountMoneyField(TestFreeCurrencyMoneyField):
@@ -297,3 +391,312 @@ class TestChoicesCurrencyDefaultAmountMoneyField(TestChoicesCurrencyMoneyField):
 
 
 
+
+
+class TestCompositeIndex(TestCase):
+    def get_indexes(self, model):
+        cursor = connection.cursor()
+        return connection.introspection.get_indexes(cursor,
+                                                    model._meta.db_table)
+    
+    def test_free_currency_index_together(self):
+        opts = testmodels.FreeCurrencyIndexModel._meta
+        self.assertIn(('price_currency', 'price_amount'), opts.index_together)
+        self.assertFalse(opts.get_field('price_amount').db_index)
+        self.assertFalse(opts.get_field('price_currency').db_index)
+    
+    def test_fixed_currency_amount_index(self):
+        opts = testmodels.FixedCurrencyIndexModel._meta
+        self.assertTrue(opts.get_field('price_amount').db_index)
+        indexes = self.get_indexes(testmodels.FixedCurrencyIndexModel)
+        self.assertIn('price_amount', indexes)
+    
+    def test_no_index_by_default(self):
+        opts = testmodels.FreeCurrencyModel._meta
+        self.assertFalse(opts.index_together)
+    
+    @unittest.skipIf(MigrationWriter is None, 'requires Django 1.7')
+    def test_migration_state(self):
+        from django.db.migrations.state import ModelState
+        state = ModelState.from_model(testmodels.FreeCurrencyIndexModel)
+        self.assertEqual(state.options['index_together'],
+                         set([('price_currency', 'price_amount')]))
+    
+    @unittest.skipIf(MigrationWriter is None, 'requires Django 1.7')
+    def test_makemigrations(self):
+        stdout = io.StringIO()
+        management.call_command('makemigrations', 'testapp', dry_run=True,
+                                verbosity=3, stdout=stdout)
+        self.assertIn("migrations.AlterIndexTogether(\\n"
+                      "            name='freecurrencyindexmodel',\\n"
+                      "            index_together=set([('price_currency', "
+                      "'price_amount')]),", stdout.getvalue())
+
+
+class TestMinorUnitsStorage(TestCase):
+    model = testmodels.MinorUnitsModel
+    
+    def test_invalid_storage(self):
+        with self.assertRaises(FieldError):
+            testfield = MoneyField(
+                name='testfield',
+                decimal_places=2,
+                max_digits=8,
+                storage='float',
+            )
+    
+    def test_too_many_digits(self):
+        with self.assertRaises(FieldError):
+            testfield = MoneyField(
+                name='testfield',
+                decimal_places=2,
+                max_digits=20,
+                storage='minor_units',
+            )
+    
+    def test_db_schema_amount_field(self):
+        field = self.model._meta.get_field('price_amount')
+        self.assertEqual(field.get_internal_type(), 'BigIntegerField')
+    
+    def test_instance_descriptor_set(self):
+        obj = self.model()
+        obj.price = Money('12.34', 'EUR')
+        self.assertEqual(obj.price_amount, 1234)
+        self.assertEqual(obj.price, Money('12.34', 'EUR'))
+    
+    def test_instance_retrieval(self):
+        obj = self.model()
+        obj.price = Money('1.5', 'EUR')
+        obj.save()
+        obj = self.model.objects.get(pk=obj.pk)
+        self.assertEqual(obj.price_amount, 150)
+        self.assertEqual(obj.price, Money('1.50', 'EUR'))
+    
+    def test_too_many_decimal_places(self):
+        obj = self.model()
+        with self.assertRaises(ValueError):
+            obj.price = Money('1.234', 'EUR')
+    
+    def test_default_amount(self):
+        obj = testmodels.FixedCurrencyMinorUnitsModel()
+        self.assertEqual(obj.price_amount, 123400)
+        self.assertEqual(obj.price, Money('1234.00', 'EUR'))
+    
+    def test_queryset(self):
+        self.model.objects.create(price=Money('1.00', 'EUR'))
+        self.model.objects.create(price=Money('2.50', 'EUR'))
+        self.model.objects.create(price=Money('3.00', 'USD'))
+        results = self.model.objects.filter(price__gt=Money('1.00', 'EUR'))
+        self.assertEqual([obj.price for obj in results],
+                         [Money('2.50', 'EUR')])
+        self.assertEqual(self.model.objects.aggregate_money('price'), {
+            'EUR': Money('3.50', 'EUR'),
+            'USD': Money('3.00', 'USD'),
+        })
+        self.assertEqual(
+            list(self.model.objects.filter(
+                price_currency='USD').money_values_list('price')),
+            [(Money('3.00', 'USD'),)]
+        )
+    
+    
+    def test_queryset_extra_decimal_places(self):
+        for amount in ['1.00', '1.01', '2.00']:
+            self.model.objects.create(price=Money(amount, 'EUR'))
+        
+        def prices(**kwargs):
+            return sorted(str(obj.price.amount)
+                          for obj in self.model.objects.filter(**kwargs))
+        bound = Money('1.005', 'EUR')
+        self.assertEqual(prices(price__lt=bound), ['1.00'])
+        self.assertEqual(prices(price__lte=bound), ['1.00'])
+        self.assertEqual(prices(price__gt=bound), ['1.01', '2.00'])
+        self.assertEqual(prices(price__gte=bound), ['1.01', '2.00'])
+        self.assertEqual(prices(price__range=(bound, Money('2.005', 'EUR'))),
+                         ['1.01', '2.00'])
+        self.assertEqual(prices(price=bound), [])
+        self.assertEqual(prices(price__in=[bound, Money('2.00', 'EUR')]),
+                         ['2.00'])
+        self.assertEqual(prices(price__in=[bound]), [])
+
+class TestNumericCurrencyStorage(TestCase):
+    model = testmodels.NumericCurrencyModel
+    
+    def test_invalid_currency_storage(self):
+        with self.assertRaises(FieldError):
+            testfield = MoneyField(
+                name='testfield',
+                decimal_places=2,
+                max_digits=8,
+                currency_storage='name',
+            )
+    
+    def test_db_schema_currency_field(self):
+        field = self.model._meta.get_field('price_currency')
+        self.assertEqual(field.get_internal_type(), 'SmallIntegerField')
+        self.assertEqual(field.choices,
+                         [(978, 'EUR'), (840, 'USD'), (156, 'CNY')])
+    
+    def test_default_currency(self):
+        obj = self.model(price_amount=Decimal('1.00'))
+        self.assertEqual(obj.price_currency, 978)
+        self.assertEqual(obj.price, Money('1.00', 'EUR'))
+    
+    def test_instance_descriptor_set(self):
+        obj = self.model()
+        obj.price = Money('1.00', 'USD')
+        self.assertEqual(obj.price_currency, 840)
+        obj.save()
+        obj = self.model.objects.get(pk=obj.pk)
+        self.assertEqual(obj.price, Money('1.00', 'USD'))
+    
+    def test_unknown_currency(self):
+        obj = self.model()
+        with self.assertRaises(ValueError):
+            obj.price = Money('1.00', 'AAA')
+    
+    def test_validation(self):
+        obj = self.model()
+        obj.price = Money('1.00', 'USD')
+        obj.full_clean()
+        obj.price_currency = 826
+        with self.assertRaises(ValidationError):
+            obj.full_clean()
+        obj.price_currency = 999
+        with self.assertRaises(ValidationError):
+            obj.full_clean()
+    
+    def test_queryset(self):
+        self.model.objects.create(price=Money('1.00', 'EUR'))
+        self.model.objects.create(price=Money('2.00', 'EUR'))
+        self.model.objects.create(price=Money('3.00', 'USD'))
+        results = self.model.objects.filter(price__lt=Money('5.00', 'USD'))
+        self.assertEqual([obj.price for obj in results],
+                         [Money('3.00', 'USD')])
+        self.assertEqual(self.model.objects.aggregate_money('price'), {
+            'EUR': Money('3.00', 'EUR'),
+            'USD': Money('3.00', 'USD'),
+        })
+
+
+class TestCompactMoney(TestCase):
+    def setUp(self):
+        self.value = CompactMoney('1.50', 'EUR')
+    
+    def test_attributes_in_slots(self):
+        self.assertEqual(CompactMoney.__slots__, ('_amount', '_currency'))
+        self.assertEqual(self.value.amount, Decimal('1.50'))
+        self.assertEqual(self.value.currency, 'EUR')
+    
+    @unittest.skipIf(tracemalloc is None, 'requires tracemalloc')
+    def test_memory_usage(self):
+        amount = Decimal('1.50')
+        
+        def allocated(money_class):
+            tracemalloc.start()
+            try:
+                values = [money_class(amount, 'EUR') for i in range(1000)]
+                return tracemalloc.get_traced_memory()[0]
+            finally:
+                tracemalloc.stop()
+        
+        self.assertLess(allocated(CompactMoney), allocated(Money) * 0.75)
+    
+    def test_immutable(self):
+        with self.assertRaises(AttributeError):
+            self.value._amount = Decimal('2')
+        with self.assertRaises(AttributeError):
+            del self.value._currency
+    
+    def test_invalid_values(self):
+        with self.assertRaises(ValueError):
+            CompactMoney('x', 'EUR')
+        with self.assertRaises(ValueError):
+            CompactMoney('1', 'eur')
+    
+    def test_money_interoperability(self):
+        money = Money('1.50', 'EUR')
+        self.assertIsInstance(self.value, Money)
+        self.assertEqual(self.value, money)
+        self.assertEqual(money, self.value)
+        self.assertEqual(hash(self.value), hash(money))
+        self.assertEqual(money + self.value, Money('3.00', 'EUR'))
+        total = self.value + money
+        self.assertIsInstance(total, CompactMoney)
+        self.assertEqual(total, Money('3.00', 'EUR'))
+        self.assertLess(money, self.value * 2)
+        self.assertIs(type(self.value.to_money()), Money)
+    
+    def test_copy_and_pickle(self):
+        self.assertEqual(copy.deepcopy(self.value), self.value)
+        value = pickle.loads(pickle.dumps(self.value))
+        self.assertIsInstance(value, CompactMoney)
+        self.assertEqual(value, self.value)
+
+
+class TestMoneyClass(TestCase):
+    model = testmodels.CompactMoneyModel
+    
+    def test_invalid_money_class(self):
+        with self.assertRaises(FieldError):
+            MoneyField(name='testfield', decimal_places=2, max_digits=8,
+                       money_class=Decimal)
+    
+    def test_default_money_class(self):
+        obj = testmodels.FreeCurrencyModel()
+        obj.price = CompactMoney('1.00', 'EUR')
+        self.assertIs(type(obj.price), Money)
+    
+    def test_instance_descriptor_get(self):
+        obj = self.model()
+        obj.price = Money('1.00', 'EUR')
+        self.assertIs(type(obj.price), CompactMoney)
+        self.assertEqual(obj.price, Money('1.00', 'EUR'))
+    
+    def test_queryset(self):
+        self.model.objects.create(price=Money('1.00', 'EUR'))
+        obj = self.model.objects.get()
+        self.assertIs(type(obj.price), CompactMoney)
+        rows = list(self.model.objects.money_values_list('price'))
+        self.assertIs(type(rows[0][0]), CompactMoney)
+
+
+class TestQuantize(TestCase):
+    model = testmodels.QuantizedModel
+    
+    def test_disabled_by_default(self):
+        obj = testmodels.FreeCurrencyModel()
+        obj.price = Money('1.005', 'EUR')
+        self.assertEqual(obj.price_amount, Decimal('1.005'))
+    
+    def test_quantize_on_assignment(self):
+        obj = self.model()
+        obj.price = Money('1.005', 'EUR')
+        self.assertEqual(str(obj.price_amount), '1.00')
+        obj.price = Money('1.015', 'EUR')
+        self.assertEqual(str(obj.price_amount), '1.02')
+        obj.price = Money('3', 'USD')
+        self.assertEqual(str(obj.price_amount), '3.00')
+        self.assertEqual(repr(obj.price), 'USD 3.00')
+    
+    def test_too_many_digits(self):
+        obj = self.model()
+        with self.assertRaises(ValueError):
+            obj.price = Money('123456.00', 'EUR')
+    
+    def test_quantize_on_create_and_update(self):
+        obj = self.model.objects.create(price=Money('1.235', 'EUR'))
+        self.assertEqual(str(obj.price_amount), '1.24')
+        self.model.objects.update(price=Money('2.225', 'EUR'))
+        self.assertEqual(self.model.objects.get().price,
+                         Money('2.22', 'EUR'))
+    
+    def test_lookups_not_quantized(self):
+        self.model.objects.create(price=Money('1.00', 'EUR'))
+        self.assertTrue(self.model.objects.filter(
+            price__gt=Money('0.995', 'EUR')).exists())
+    
+    def test_minor_units(self):
+        obj = testmodels.QuantizedMinorUnitsModel()
+        obj.price = Money('1.235', 'EUR')
+        self.assertEqual(obj.price_amount, 124)
@@ -0,0 +1,698 @@
+from decimal import Decimal
+
+from django.core.exceptions import FieldError
+from django.db import router
+from django.db.models import Avg, Max, Q, Sum
+from django.test import TestCase
+
+from money import Money
+
+from moneyfield import MoneyWindow, prefetch_money
+from moneyfield.models import ExchangeRate
+from testapp.models import (FreeCurrencyManagerModel,
+                            FixedCurrencyManagerModel, MinorUnitsModel,
+                            NullableMoneyModel, RelatedMoneyModel,
+                            NestedRelatedMoneyModel)
+
+
+class TestFreeCurrencyMoneyLookups(TestCase):
+    model = FreeCurrencyManagerModel
+    
+    def setUp(self):
+        for amount, currency in [('1.00', 'EUR'), ('2.00', 'EUR'),
+                                 ('3.00', 'EUR'), ('1.00', 'USD')]:
+            self.model.objects.create(
+                price_amount=Decimal(amount),
+                price_currency=currency
+            )
+    
+    def prices(self, queryset):
+        return sorted((obj.price_currency, obj.price_amount)
+                      for obj in queryset)
+    
+    def test_exact(self):
+        results = self.model.objects.filter(price=Money('1.00', 'EUR'))
+        self.assertEqual(self.prices(results), [('EUR', Decimal('1.00'))])
+    
+    def test_get(self):
+        obj = self.model.objects.get(price=Money('1.00', 'USD'))
+        self.assertEqual(obj.price, Money('1.00', 'USD'))
+    
+    def test_lt(self):
+        results = self.model.objects.filter(price__lt=Money('3.00', 'EUR'))
+        self.assertEqual(self.prices(results), [('EUR', Decimal('1.00')),
+                                                ('EUR', Decimal('2.00'))])
+    
+    def test_gte(self):
+        results = self.model.objects.filter(price__gte=Money('1.00', 'USD'))
+        self.assertEqual(self.prices(results), [('USD', Decimal('1.00'))])
+    
+    def test_in(self):
+        results = self.model.objects.filter(price__in=[
+            Money('1.00', 'USD'),
+            Money('3.00', 'EUR'),
+            Money('5.00', 'EUR'),
+        ])
+        self.assertEqual(self.prices(results), [('EUR', Decimal('3.00')),
+                                                ('USD', Decimal('1.00'))])
+    
+    def test_in_empty(self):
+        results = self.model.objects.filter(price__in=[])
+        self.assertEqual(list(results), [])
+    
+    def test_range(self):
+        results = self.model.objects.filter(
+            price__range=(Money('2.00', 'EUR'), Money('5.00', 'EUR'))
+        )
+        self.assertEqual(self.prices(results), [('EUR', Decimal('2.00')),
+                                                ('EUR', Decimal('3.00'))])
+    
+    def test_range_mixed_currencies(self):
+        with self.assertRaises(TypeError):
+            self.model.objects.filter(
+                price__range=(Money('2.00', 'EUR'), Money('5.00', 'USD'))
+            )
+    
+    def test_exclude(self):
+        results = self.model.objects.exclude(price=Money('1.00', 'EUR'))
+        self.assertEqual(len(results), 3)
+    
+    def test_q_objects(self):
+        results = self.model.objects.filter(
+            Q(price=Money('1.00', 'USD')) | Q(price__gt=Money('2.00', 'EUR'))
+        )
+        self.assertEqual(self.prices(results), [('EUR', Decimal('3.00')),
+                                                ('USD', Decimal('1.00'))])
+    
+    def test_combined_with_other_lookups(self):
+        results = self.model.objects.filter(price__lt=Money('5.00', 'EUR'),
+                                            price_amount__gt=Decimal('1.00'))
+        self.assertEqual(len(results), 2)
+    
+    def test_unsupported_lookup(self):
+        with self.assertRaises(FieldError):
+            self.model.objects.filter(price__contains=Money('1.00', 'EUR'))
+    
+    def test_invalid_value(self):
+        with self.assertRaises(TypeError):
+            self.model.objects.filter(price=Decimal('1.00'))
+    
+    def test_create(self):
+        obj = self.model.objects.create(price=Money('9.99', 'GBP'))
+        self.assertEqual(self.model.objects.get(pk=obj.pk).price,
+                         Money('9.99', 'GBP'))
+    
+    def test_update(self):
+        updated = self.model.objects.filter(
+            price_currency='EUR'
+        ).update(price=Money('5.00', 'USD'))
+        self.assertEqual(updated, 3)
+        self.assertEqual(self.model.objects.filter(
+            price=Money('5.00', 'USD')).count(), 3)
+    
+    def test_update_or_create(self):
+        obj, created = self.model.objects.update_or_create(
+            price=Money('1.00', 'USD'),
+            defaults={'price': Money('2.00', 'USD')}
+        )
+        self.assertFalse(created)
+        self.assertEqual(self.model.objects.get(pk=obj.pk).price,
+                         Money('2.00', 'USD'))
+        obj, created = self.model.objects.update_or_create(
+            price=Money('7.00', 'USD'),
+            defaults={'name': 'new'}
+        )
+        self.assertTrue(created)
+        self.assertEqual(obj.price, Money('7.00', 'USD'))
+    
+    def test_bulk_update(self):
+        objs = list(self.model.objects.order_by('pk'))
+        for i, obj in enumerate(objs):
+            obj.price = Money(i, 'GBP')
+            obj.name = str(i)
+        updated = self.model.objects.bulk_update(objs, ['price', 'name'],
+                                                 batch_size=3)
+        self.assertEqual(updated, 4)
+        rows = self.model.objects.order_by('pk').money_values_list(
+            'name', 'price')
+        self.assertEqual(list(rows), [
+            ('0', Money('0', 'GBP')),
+            ('1', Money('1', 'GBP')),
+            ('2', Money('2', 'GBP')),
+            ('3', Money('3', 'GBP')),
+        ])
+    
+    def test_bulk_update_write_database(self):
+        class RecordingRouter(object):
+            def db_for_read(self, model, **hints):
+                calls.append(('read', model))
+            
+            def db_for_write(self, model, **hints):
+                calls.append(('write', model))
+        
+        calls = []
+        objs = list(self.model.objects.all())
+        routers = router.routers
+        router.routers = [RecordingRouter()]
+        try:
+            self.model.objects.bulk_update(objs, ['price'])
+        finally:
+            router.routers = routers
+        self.assertEqual(set(calls), set([('write', self.model)]))
+    
+    def test_bulk_update_only_given_fields(self):
+        objs = list(self.model.objects.all())
+        for obj in objs:
+            obj.price = Money('0', 'GBP')
+            obj.name = 'changed'
+        self.model.objects.bulk_update(objs, ['name'])
+        self.assertEqual(self.model.objects.filter(name='changed').count(), 4)
+        self.assertEqual(self.model.objects.filter(
+            price_currency='GBP').count(), 0)
+    
+    def test_money_values(self):
+        rows = self.model.objects.filter(
+            price_currency='USD'
+        ).money_values('name', 'price')
+        self.assertEqual(list(rows), [
+            {'name': '', 'price': Money('1.00', 'USD')},
+        ])
+    
+    def test_money_values_all_fields(self):
+        obj = self.model.objects.get(price=Money('1.00', 'USD'))
+        rows = self.model.objects.filter(pk=obj.pk).money_values()
+        self.assertEqual(list(rows), [
+            {'id': obj.pk, 'name': '', 'price': Money('1.00', 'USD')},
+        ])
+    
+    def test_money_values_list(self):
+        rows = self.model.objects.order_by(
+            'price_currency', 'price_amount'
+        ).money_values_list('price')
+        self.assertEqual(list(rows), [
+            (Money('1.00', 'EUR'),),
+            (Money('2.00', 'EUR'),),
+            (Money('3.00', 'EUR'),),
+            (Money('1.00', 'USD'),),
+        ])
+    
+    def test_aggregate_money_sum(self):
+        totals = self.model.objects.aggregate_money('price')
+        self.assertEqual(totals, {
+            'EUR': Money('6.00', 'EUR'),
+            'USD': Money('1.00', 'USD'),
+        })
+        self.assertEqual(list(totals.keys()), ['EUR', 'USD'])
+    
+    def test_aggregate_money_avg(self):
+        totals = self.model.objects.aggregate_money('price', Avg)
+        self.assertEqual(totals['EUR'], Money('2.00', 'EUR'))
+    
+    def test_aggregate_money_filtered(self):
+        totals = self.model.objects.filter(
+            price__gt=Money('1.00', 'EUR')
+        ).aggregate_money('price', Max)
+        self.assertEqual(totals, {'EUR': Money('3.00', 'EUR')})
+    
+    def test_aggregate_money_empty(self):
+        totals = self.model.objects.none().aggregate_money('price')
+        self.assertEqual(totals, {})
+    
+    def test_money_histogram(self):
+        self.model.objects.create(price=Money('10.00', 'USD'))
+        with self.assertNumQueries(1):
+            histogram = self.model.objects.money_histogram(
+                'price', buckets=[Decimal('2.00'), 5]
+            )
+        self.assertEqual(list(histogram), ['EUR', 'USD'])
+        self.assertEqual(histogram['EUR'], [
+            (None, Money('2.00', 'EUR'), 1),
+            (Money('2.00', 'EUR'), Money('5', 'EUR'), 2),
+            (Money('5', 'EUR'), None, 0),
+        ])
+        self.assertEqual(histogram['USD'], [
+            (None, Money('2.00', 'USD'), 1),
+            (Money('2.00', 'USD'), Money('5', 'USD'), 0),
+            (Money('5', 'USD'), None, 1),
+        ])
+    
+    def test_money_histogram_filtered(self):
+        histogram = self.model.objects.filter(
+            price_currency='USD'
+        ).money_histogram('price', buckets=[1.5])
+        self.assertEqual(histogram, {'USD': [
+            (None, Money('1.5', 'USD'), 1),
+            (Money('1.5', 'USD'), None, 0),
+        ]})
+    
+    def test_money_histogram_invalid_buckets(self):
+        with self.assertRaises(ValueError):
+            self.model.objects.money_histogram('price', buckets=[2, 1])
+    
+    def test_money_histogram_null_values(self):
+        NullableMoneyModel.objects.create(price=Money('5.00', 'EUR'))
+        NullableMoneyModel.objects.create(price=Money('50.00', 'EUR'))
+        NullableMoneyModel.objects.create(price=None)
+        NullableMoneyModel.objects.create(price_amount=Decimal('15.00'),
+                                          price_currency=None)
+        histogram = NullableMoneyModel.objects.money_histogram(
+            'price', buckets=[10, 20])
+        self.assertEqual(histogram, {'EUR': [
+            (None, Money('10', 'EUR'), 1),
+            (Money('10', 'EUR'), Money('20', 'EUR'), 0),
+            (Money('20', 'EUR'), None, 1),
+        ]})
+    
+    def test_aggregate_money_null_currency(self):
+        NullableMoneyModel.objects.create(price=Money('5.00', 'EUR'))
+        NullableMoneyModel.objects.create(price=None)
+        NullableMoneyModel.objects.create(price_amount=Decimal('15.00'),
+                                          price_currency=None)
+        totals = NullableMoneyModel.objects.aggregate_money('price')
+        self.assertEqual(totals, {'EUR': Money('5.00', 'EUR')})
+    
+    def test_aggregate_money_invalid_field(self):
+        with self.assertRaises(FieldError):
+            self.model.objects.aggregate_money('name')
+
+
+class TestFixedCurrencyMoneyLookups(TestCase):
+    model = FixedCurrencyManagerModel
+    
+    def setUp(self):
+        for amount in ['1.00', '2.00', '3.00']:
+            self.model.objects.create(price_amount=Decimal(amount))
+    
+    def test_lte(self):
+        results = self.model.objects.filter(price__lte=Money('2.00', 'EUR'))
+        self.assertEqual(results.count(), 2)
+    
+    def test_in(self):
+        results = self.model.objects.filter(
+            price__in=[Money('1.00', 'EUR'), Money('3.00', 'EUR')]
+        )
+        self.assertEqual(results.count(), 2)
+    
+    def test_invalid_currency(self):
+        with self.assertRaises(TypeError):
+            self.model.objects.filter(price=Money('1.00', 'USD'))
+    
+    def test_update(self):
+        self.model.objects.update(price=Money('5.00', 'EUR'))
+        self.assertEqual(self.model.objects.filter(
+            price_amount=Decimal('5.00')).count(), 3)
+    
+    def test_update_invalid_currency(self):
+        with self.assertRaises(TypeError):
+            self.model.objects.update(price=Money('5.00', 'USD'))
+    
+    def test_bulk_update(self):
+        objs = list(self.model.objects.all())
+        for obj in objs:
+            obj.price = obj.price * 2
+        self.model.objects.bulk_update(objs, ['price'])
+        self.assertEqual(self.model.objects.aggregate_money('price'),
+                         {'EUR': Money('12.00', 'EUR')})
+    
+    def test_money_values_list(self):
+        rows = self.model.objects.order_by(
+            'price_amount'
+        ).money_values_list('price', 'name')
+        self.assertEqual(list(rows), [
+            (Money('1.00', 'EUR'), ''),
+            (Money('2.00', 'EUR'), ''),
+            (Money('3.00', 'EUR'), ''),
+        ])
+    
+    def test_aggregate_money_sum(self):
+        totals = self.model.objects.aggregate_money('price')
+        self.assertEqual(totals, {'EUR': Money('6.00', 'EUR')})
+    
+    def test_aggregate_money_empty(self):
+        totals = self.model.objects.filter(
+            price__gt=Money('5.00', 'EUR')
+        ).aggregate_money('price')
+        self.assertEqual(totals, {})
+    
+    def test_money_histogram(self):
+        histogram = self.model.objects.money_histogram('price', [2])
+        self.assertEqual(histogram, {'EUR': [
+            (None, Money('2', 'EUR'), 1),
+            (Money('2', 'EUR'), None, 2),
+        ]})
+    
+    def test_money_histogram_minor_units(self):
+        for amount in ['1.99', '2.00', '2.01']:
+            MinorUnitsModel.objects.create(price=Money(amount, 'EUR'))
+        histogram = MinorUnitsModel.objects.money_histogram('price', ['2.00'])
+        self.assertEqual([count for lower, upper, count in histogram['EUR']],
+                         [1, 2])
+
+
+class TestConvertedAnnotation(TestCase):
+    model = FreeCurrencyManagerModel
+    
+    def setUp(self):
+        ExchangeRate.objects.create(currency='USD', rate=Decimal('2'))
+        ExchangeRate.objects.create(currency='GBP', rate=Decimal('0.5'))
+        for amount, currency in [('3.00', 'EUR'), ('4.00', 'USD'),
+                                 ('1.00', 'GBP'), ('5.00', 'JPY')]:
+            self.model.objects.create(
+                price_amount=Decimal(amount),
+                price_currency=currency
+            )
+    
+    def converted(self, queryset, alias='price_eur'):
+        return [(obj.price_currency, getattr(obj, alias))
+                for obj in queryset]
+    
+    def test_to_base_currency(self):
+        results = self.model.objects.annotate_converted(
+            'price', to='EUR'
+        ).order_by('price_currency')
+        self.assertEqual(self.converted(results), [
+            ('EUR', Money('3.00', 'EUR')),
+            ('GBP', Money('2.00', 'EUR')),
+            ('JPY', None),
+            ('USD', Money('2.00', 'EUR')),
+        ])
+    
+    def test_to_other_currency(self):
+        results = self.model.objects.annotate_converted(
+            'price', to='USD', alias='usd'
+        ).filter(price_currency__in=['EUR', 'GBP']).order_by('price_currency')
+        self.assertEqual(self.converted(results, 'usd'), [
+            ('EUR', Money('6.00', 'USD')),
+            ('GBP', Money('4.00', 'USD')),
+        ])
+    
+    def test_inexact_division(self):
+        obj = self.model.objects.create(price=Money('15.00', 'USD'))
+        obj = self.model.objects.annotate_converted(
+            'price', to='EUR'
+        ).get(pk=obj.pk)
+        self.assertEqual(obj.price_eur, Money('7.50', 'EUR'))
+    
+    def test_order_by(self):
+        results = self.model.objects.annotate_converted(
+            'price', to='EUR'
+        ).exclude(price_currency='JPY').order_by('-price_eur',
+                                                 'price_currency')
+        self.assertEqual([obj.price_currency for obj in results],
+                         ['EUR', 'GBP', 'USD'])
+    
+    def test_filter(self):
+        results = self.model.objects.annotate_converted(
+            'price', to='EUR'
+        ).filter(price_eur__lt=Money('3.00', 'EUR'))
+        self.assertEqual(sorted(obj.price_currency for obj in results),
+                         ['GBP', 'USD'])
+        results = self.model.objects.annotate_converted(
+            'price', to='EUR'
+        ).filter(price_eur=Money('3.00', 'EUR'))
+        self.assertEqual([obj.price_currency for obj in results], ['EUR'])
+    
+    def test_filter_range(self):
+        results = self.model.objects.annotate_converted(
+            'price', to='EUR'
+        ).filter(price_eur__range=(Money('2.50', 'EUR'), Money('9', 'EUR')))
+        self.assertEqual([obj.price_currency for obj in results], ['EUR'])
+    
+    def test_filter_invalid_currency(self):
+        queryset = self.model.objects.annotate_converted('price', to='EUR')
+        with self.assertRaises(TypeError):
+            queryset.filter(price_eur__lt=Money('3.00', 'USD'))
+    
+    def test_exclude_not_supported(self):
+        queryset = self.model.objects.annotate_converted('price', to='EUR')
+        with self.assertRaises(FieldError):
+            queryset.exclude(price_eur__lt=Money('3.00', 'EUR'))
+    
+    def test_fixed_currency(self):
+        FixedCurrencyManagerModel.objects.create(price_amount=Decimal('2.00'))
+        obj = FixedCurrencyManagerModel.objects.annotate_converted(
+            'price', to='USD'
+        ).get()
+        self.assertEqual(obj.price_usd, Money('4.00', 'USD'))
+    
+    def test_minor_units(self):
+        MinorUnitsModel.objects.create(price=Money('4.00', 'USD'))
+        obj = MinorUnitsModel.objects.annotate_converted(
+            'price', to='EUR'
+        ).get()
+        self.assertEqual(obj.price_eur, Money('2.00', 'EUR'))
+    
+    def test_invalid_field(self):
+        with self.assertRaises(FieldError):
+            self.model.objects.annotate_converted('name', to='EUR')
+
+
+class TestMoneyWindow(TestCase):
+    model = FreeCurrencyManagerModel
+    
+    def setUp(self):
+        for name, amount, currency in [('a', '1.00', 'EUR'),
+                                       ('a', '2.00', 'USD'),
+                                       ('b', '3.00', 'EUR'),
+                                       ('a', '4.00', 'EUR'),
+                                       ('b', '5.00', 'USD')]:
+            self.model.objects.create(name=name, price=Money(amount, currency))
+    
+    def test_running_total(self):
+        results = self.model.objects.annotate_money_window(
+            balance=MoneyWindow('price', Sum, order_by=['pk'])
+        ).order_by('pk')
+        self.assertEqual([obj.balance for obj in results], [
+            Money('1.00', 'EUR'),
+            Money('2.00', 'USD'),
+            Money('4.00', 'EUR'),
+            Money('8.00', 'EUR'),
+            Money('7.00', 'USD'),
+        ])
+    
+    def test_running_total_fractional(self):
+        self.model.objects.all().delete()
+        for amount in ['0.10', '0.20', '0.40']:
+            self.model.objects.create(price=Money(amount, 'EUR'))
+        results = self.model.objects.annotate_money_window(
+            balance=MoneyWindow('price', Sum, order_by=['pk'])
+        ).order_by('pk')
+        self.assertEqual([str(obj.balance.amount) for obj in results],
+                         ['0.10', '0.30', '0.70'])
+    
+    def test_partition_totals(self):
+        results = self.model.objects.annotate_money_window(
+            total=MoneyWindow('price', 'sum', partition_by=['name']),
+            highest=MoneyWindow('price', Max, order_by=['-pk']),
+        ).order_by('pk')
+        self.assertEqual([(obj.total, obj.highest) for obj in results], [
+            (Money('5.00', 'EUR'), Money('4.00', 'EUR')),
+            (Money('2.00', 'USD'), Money('5.00', 'USD')),
+            (Money('3.00', 'EUR'), Money('4.00', 'EUR')),
+            (Money('5.00', 'EUR'), Money('4.00', 'EUR')),
+            (Money('5.00', 'USD'), Money('5.00', 'USD')),
+        ])
+    
+    def test_minor_units(self):
+        for amount in ['1.25', '2.50']:
+            MinorUnitsModel.objects.create(price=Money(amount, 'EUR'))
+        results = MinorUnitsModel.objects.annotate_money_window(
+            balance=MoneyWindow('price', order_by=['pk'])
+        ).order_by('pk')
+        self.assertEqual([obj.balance for obj in results],
+                         [Money('1.25', 'EUR'), Money('3.75', 'EUR')])
+    
+    def test_fixed_currency(self):
+        for amount in ['1.00', '2.00']:
+            FixedCurrencyManagerModel.objects.create(price_amount=amount)
+        results = FixedCurrencyManagerModel.objects.annotate_money_window(
+            balance=MoneyWindow('price', order_by=['-pk'])
+        ).order_by('pk')
+        self.assertEqual([obj.balance for obj in results],
+                         [Money('3.00', 'EUR'), Money('2.00', 'EUR')])
+    
+    def test_currency_partition_required(self):
+        with self.assertRaises(FieldError):
+            self.model.objects.annotate_money_window(
+                total=MoneyWindow('price', partition_by_currency=False)
+            )
+    
+    def test_filter_not_supported(self):
+        queryset = self.model.objects.annotate_money_window(
+            total=MoneyWindow('price')
+        )
+        with self.assertRaises(FieldError):
+            queryset.filter(total__gt=Money('1.00', 'EUR'))
+
+
+class TestDeferredMoney(TestCase):
+    model = FreeCurrencyManagerModel
+    
+    def setUp(self):
+        for amount, currency in [('1.00', 'EUR'), ('2.00', 'USD'),
+                                 ('3.00', 'GBP')]:
+            self.model.objects.create(name=currency,
+                                      price=Money(amount, currency))
+    
+    def test_defer(self):
+        obj = self.model.objects.defer('price').get(name='USD')
+        self.assertNotIn('price_amount', obj.__dict__)
+        self.assertNotIn('price_currency', obj.__dict__)
+        with self.assertNumQueries(1):
+            self.assertEqual(obj.price, Money('2.00', 'USD'))
+            self.assertEqual(obj.price_currency, 'USD')
+    
+    def test_only(self):
+        obj = self.model.objects.only('price').get(name='USD')
+        self.assertIn('price_amount', obj.__dict__)
+        self.assertIn('price_currency', obj.__dict__)
+        with self.assertNumQueries(1):
+            obj.name
+    
+    def test_one_column_deferred(self):
+        obj = self.model.objects.defer('price_currency').get(name='GBP')
+        with self.assertNumQueries(1):
+            self.assertEqual(obj.price, Money('3.00', 'GBP'))
+    
+    def test_fixed_currency(self):
+        FixedCurrencyManagerModel.objects.create(price_amount=Decimal('5'))
+        obj = FixedCurrencyManagerModel.objects.only('name').get()
+        with self.assertNumQueries(1):
+            self.assertEqual(obj.price, Money('5', 'EUR'))
+    
+    def test_save_deferred(self):
+        obj = self.model.objects.defer('price').get(name='EUR')
+        obj.price = Money('9.00', 'EUR')
+        obj.save()
+        self.assertEqual(self.model.objects.get(pk=obj.pk).price,
+                         Money('9.00', 'EUR'))
+    
+    def test_prefetch_money(self):
+        objs = list(self.model.objects.only('name').order_by('pk'))
+        with self.assertNumQueries(1):
+            prefetch_money(objs, 'price')
+        with self.assertNumQueries(0):
+            self.assertEqual([obj.price for obj in objs], [
+                Money('1.00', 'EUR'),
+                Money('2.00', 'USD'),
+                Money('3.00', 'GBP'),
+            ])
+    
+    def test_prefetch_money_keeps_assigned_values(self):
+        objs = list(self.model.objects.defer('price_amount'))
+        objs[0].price_amount = Decimal('7.00')
+        prefetch_money(objs)
+        self.assertEqual(objs[0].price_amount, Decimal('7.00'))
+    
+    def test_prefetch_money_nothing_deferred(self):
+        objs = list(self.model.objects.all())
+        with self.assertNumQueries(0):
+            prefetch_money(objs)
+    
+    def test_prefetch_money_invalid_field(self):
+        objs = list(self.model.objects.only('name'))
+        with self.assertRaises(FieldError):
+            prefetch_money(objs, 'name')
+
+
+class TestRelatedMoney(TestCase):
+    model = RelatedMoneyModel
+    
+    def setUp(self):
+        product = FreeCurrencyManagerModel.objects.create(
+            price=Money('2.50', 'USD'))
+        fixed_product = FixedCurrencyManagerModel.objects.create(
+            price=Money('3.00', 'EUR'))
+        minor_units_product = MinorUnitsModel.objects.create(
+            price=Money('4.25', 'GBP'))
+        self.obj = self.model.objects.create(
+            name='full', product=product, fixed_product=fixed_product,
+            minor_units_product=minor_units_product)
+        self.model.objects.create(name='empty')
+    
+    def test_related_money(self):
+        queryset = self.model.objects.with_related_money(
+            'product__price', 'fixed_product__price',
+            'minor_units_product__price')
+        with self.assertNumQueries(1):
+            obj = queryset.get(name='full')
+            self.assertEqual(obj.product_price, Money('2.50', 'USD'))
+            self.assertEqual(obj.fixed_product_price, Money('3.00', 'EUR'))
+            self.assertEqual(obj.minor_units_product_price,
+                             Money('4.25', 'GBP'))
+            self.assertEqual(str(obj.product_price_amount), '2.50')
+            self.assertEqual(obj.product_price_currency, 'USD')
+    
+    def test_joins(self):
+        queryset = NestedRelatedMoneyModel.objects.with_related_money(
+            'parent__product__price')
+        sql = str(queryset.query)
+        self.assertEqual(sql.count('SELECT'), 1)
+        self.assertEqual(sql.count('JOIN'), 2)
+        self.assertIn('LEFT OUTER JOIN', sql)
+    
+    def test_null_relation(self):
+        obj = self.model.objects.with_related_money('product__price').get(
+            name='empty')
+        self.assertIsNone(obj.product_price)
+    
+    def test_nested_relation(self):
+        NestedRelatedMoneyModel.objects.create(parent=self.obj)
+        queryset = NestedRelatedMoneyModel.objects.with_related_money(
+            'parent__product__price')
+        with self.assertNumQueries(1):
+            self.assertEqual([obj.parent_product_price for obj in queryset],
+                             [Money('2.50', 'USD')])
+    
+    def test_order_by(self):
+        self.model.objects.create(
+            name='cheap',
+            product=FreeCurrencyManagerModel.objects.create(
+                price=Money('1.00', 'USD')))
+        queryset = self.model.objects.with_related_money(
+            'product__price').filter(product__isnull=False)
+        self.assertEqual(
+            [obj.name for obj in queryset.order_by('product_price_amount')],
+            ['cheap', 'full'])
+    
+    def test_invalid_lookup(self):
+        for lookup in ['price', 'name__price', 'product__name',
+                       'product__missing']:
+            with self.assertRaises(FieldError):
+                self.model.objects.with_related_money(lookup)
+
+
+class TestNullMoneyLookups(TestCase):
+    model = NullableMoneyModel
+    
+    def setUp(self):
+        self.model.objects.create(name='money', price=Money('1.00', 'EUR'))
+        self.model.objects.create(name='none', price=None)
+        self.model.objects.create(name='no currency',
+                                  price_amount=Decimal('2.00'),
+                                  price_currency=None)
+    
+    def names(self, queryset):
+        return sorted(obj.name for obj in queryset)
+    
+    def test_exact_none(self):
+        self.assertEqual(self.names(self.model.objects.filter(price=None)),
+                         ['no currency', 'none'])
+        self.assertEqual(self.names(self.model.objects.exclude(price=None)),
+                         ['money'])
+    
+    def test_isnull(self):
+        self.assertEqual(
+            self.names(self.model.objects.filter(price__isnull=True)),
+            ['no currency', 'none'])
+        self.assertEqual(
+            self.names(self.model.objects.filter(price__isnull=False)),
+            ['money'])
+    
+    def test_fixed_currency_isnull(self):
+        FixedCurrencyManagerModel.objects.create(price_amount=Decimal('1'))
+        self.assertEqual(
+            FixedCurrencyManagerModel.objects.filter(price=None).count(), 0)
+        self.assertEqual(
+            FixedCurrencyManagerModel.objects.filter(
+                price__isnull=False).count(), 1)
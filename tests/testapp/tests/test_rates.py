@@ -0,0 +1,79 @@
+from decimal import Decimal
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from money import Money, xrates
+
+from moneyfield import rates
+from moneyfield.models import ExchangeRate
+
+
+class TestLocalBackend(TestCase):
+    def setUp(self):
+        self.backend = rates.LocalBackend(base='EUR')
+        self.backend.setrate('USD', '1.25')
+        self.backend.setrate('GBP', '0.5')
+    
+    def test_rate(self):
+        self.assertEqual(self.backend.rate('EUR'), Decimal('1'))
+        self.assertEqual(self.backend.rate('USD'), Decimal('1.25'))
+        self.assertIsNone(self.backend.rate('JPY'))
+    
+    def test_quotation(self):
+        self.assertEqual(self.backend.quotation('USD', 'GBP'), Decimal('0.4'))
+        self.assertIsNone(self.backend.quotation('USD', 'JPY'))
+
+
+class TestDatabaseBackend(TestCase):
+    def setUp(self):
+        ExchangeRate.objects.create(currency='USD', rate=Decimal('1.25'))
+        ExchangeRate.objects.create(currency='GBP', rate=Decimal('0.5'))
+    
+    def tearDown(self):
+        rates.uninstall()
+    
+    def test_base_from_settings(self):
+        self.assertEqual(rates.DatabaseBackend().base, 'EUR')
+    
+    @override_settings(MONEY_RATES_BASE=None)
+    def test_missing_base(self):
+        with self.assertRaises(ImproperlyConfigured):
+            rates.DatabaseBackend()
+    
+    def test_rates_cached(self):
+        backend = rates.DatabaseBackend()
+        with self.assertNumQueries(1):
+            self.assertEqual(backend.rate('USD'), Decimal('1.25'))
+            self.assertEqual(backend.quotation('USD', 'GBP'), Decimal('0.4'))
+            self.assertIsNone(backend.rate('JPY'))
+    
+    def test_rates_expire(self):
+        backend = rates.DatabaseBackend(timeout=0)
+        with self.assertNumQueries(2):
+            backend.rate('USD')
+            backend.rate('USD')
+    
+    def test_clear(self):
+        backend = rates.DatabaseBackend()
+        backend.rate('USD')
+        ExchangeRate.objects.filter(currency='USD').update(rate=Decimal('2'))
+        self.assertEqual(backend.rate('USD'), Decimal('1.25'))
+        backend.clear()
+        self.assertEqual(backend.rate('USD'), Decimal('2'))
+    
+    def test_install(self):
+        rates.install()
+        self.assertEqual(xrates.backend_name, 'DatabaseBackend')
+        with self.assertNumQueries(1):
+            self.assertEqual(Money('10', 'EUR').to('USD'),
+                             Money('12.5', 'USD'))
+            self.assertEqual(Money('10', 'USD').to('GBP'),
+                             Money('4', 'GBP'))
+    
+    def test_install_local(self):
+        rates.install('moneyfield.rates.LocalBackend')
+        xrates.base = 'EUR'
+        xrates.setrate('USD', '2')
+        self.assertEqual(Money('10', 'EUR').to('USD'), Money('20', 'USD'))
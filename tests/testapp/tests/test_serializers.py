@@ -0,0 +1,151 @@
+import json
+from decimal import Decimal
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.base import DeserializationError
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase
+
+from money import Money
+
+from moneyfield import serializers
+from testapp.models import (FreeCurrencyModel, FixedCurrencyModel,
+                            MinorUnitsModel, NumericCurrencyModel)
+
+
+class TestMoneyFieldConversion(TestCase):
+    def setUp(self):
+        self.field = FreeCurrencyModel._meta.moneyfields[0]
+    
+    def test_to_python(self):
+        self.assertEqual(self.field.to_python('EUR 12.34'),
+                         Money('12.34', 'EUR'))
+        self.assertEqual(self.field.to_python(Money('1', 'USD')),
+                         Money('1', 'USD'))
+        self.assertIsNone(self.field.to_python(None))
+        self.assertIsNone(self.field.to_python(''))
+    
+    def test_to_python_invalid(self):
+        for value in ['12.34', 'EUR x', 'EUR 1 2', 1]:
+            with self.assertRaises(ValidationError):
+                self.field.to_python(value)
+    
+    def test_to_python_fixed_currency(self):
+        field = FixedCurrencyModel._meta.moneyfields[0]
+        self.assertEqual(field.to_python('EUR 1.00'), Money('1.00', 'EUR'))
+        with self.assertRaises(ValidationError):
+            field.to_python('USD 1.00')
+    
+    def test_value_to_string(self):
+        obj = FreeCurrencyModel()
+        obj.price = Money('12.34', 'EUR')
+        self.assertEqual(self.field.value_to_string(obj), 'EUR 12.34')
+        obj.price = None
+        self.assertEqual(self.field.value_to_string(obj), '')
+
+
+class TestSerializer(TestCase):
+    def setUp(self):
+        obj = FreeCurrencyModel(name='book')
+        obj.price = Money('12.34', 'EUR')
+        obj.save()
+        obj = NumericCurrencyModel()
+        obj.price = Money('5.00', 'USD')
+        obj.save()
+    
+    def serialize(self, queryset, **options):
+        return json.loads(serializers.Serializer().serialize(queryset,
+                                                             **options))
+    
+    def test_serialize(self):
+        data = self.serialize(FreeCurrencyModel.objects.all())
+        self.assertEqual(data[0]['fields'], {
+            'name': 'book',
+            'price': 'EUR 12.34',
+        })
+    
+    def test_serialize_selected_fields(self):
+        data = self.serialize(FreeCurrencyModel.objects.all(),
+                              fields=['price'])
+        self.assertEqual(data[0]['fields'], {'price': 'EUR 12.34'})
+    
+    def test_serialize_numeric_currency(self):
+        data = self.serialize(NumericCurrencyModel.objects.all())
+        self.assertEqual(data[0]['fields']['price'], 'USD 5.00')
+    
+    def test_round_trip(self):
+        fixture = serializers.Serializer().serialize(
+            list(FreeCurrencyModel.objects.all()) +
+            list(NumericCurrencyModel.objects.all())
+        )
+        FreeCurrencyModel.objects.all().delete()
+        NumericCurrencyModel.objects.all().delete()
+        for deserialized in serializers.Deserializer(fixture):
+            deserialized.save()
+        self.assertEqual(FreeCurrencyModel.objects.get().price,
+                         Money('12.34', 'EUR'))
+        self.assertEqual(NumericCurrencyModel.objects.get().price,
+                         Money('5.00', 'USD'))
+    
+    def test_deserialize_columns(self):
+        fixture = json.dumps([{
+            'model': 'testapp.freecurrencymodel',
+            'pk': 10,
+            'fields': {'price_amount': '1.00', 'price_currency': 'USD'},
+        }])
+        obj = next(serializers.Deserializer(fixture)).object
+        self.assertEqual(obj.price, Money('1.00', 'USD'))
+    
+    def test_deserialize_invalid(self):
+        fixture = json.dumps([{
+            'model': 'testapp.freecurrencymodel',
+            'fields': {'price': 'EUR'},
+        }])
+        with self.assertRaises(DeserializationError):
+            list(serializers.Deserializer(fixture))
+
+
+class TestLoadFixture(TestCase):
+    def test_load_fixture(self):
+        fixture = json.dumps([
+            {'model': 'testapp.minorunitsmodel', 'pk': i,
+             'fields': {'name': str(i), 'price': 'EUR {}.50'.format(i)}}
+            for i in range(1, 6)
+        ] + [
+            {'model': 'testapp.freecurrencymodel', 'pk': 1,
+             'fields': {'name': 'book', 'price': 'USD 1.00'}},
+        ])
+        with self.assertNumQueries(4):
+            count = serializers.load_fixture(fixture, batch_size=2)
+        self.assertEqual(count, 6)
+        self.assertEqual(MinorUnitsModel.objects.count(), 5)
+        self.assertEqual(MinorUnitsModel.objects.get(pk=5).price_amount, 550)
+        self.assertEqual(FreeCurrencyModel.objects.get(pk=1).price_amount,
+                         Decimal('1.00'))
+    
+    def test_reset_sequences(self):
+        fixture = json.dumps([
+            {'model': 'testapp.minorunitsmodel', 'pk': 1,
+             'fields': {'price': 'EUR 1.00'}},
+            {'model': 'testapp.freecurrencymodel', 'pk': 1,
+             'fields': {'price': 'USD 1.00'}},
+        ])
+        with mock.patch.object(connection.ops, 'sequence_reset_sql',
+                               return_value=[]) as sequence_reset_sql:
+            serializers.load_fixture(fixture)
+        (style, models), kwargs = sequence_reset_sql.call_args
+        self.assertEqual(models, set([MinorUnitsModel, FreeCurrencyModel]))
+
+
+class TestLoadFixtureTransaction(TransactionTestCase):
+    def test_rollback(self):
+        fixture = json.dumps([
+            {'model': 'testapp.minorunitsmodel', 'pk': 1,
+             'fields': {'price': 'EUR 1.00'}},
+            {'model': 'testapp.minorunitsmodel', 'pk': 1,
+             'fields': {'price': 'EUR 2.00'}},
+        ])
+        with self.assertRaises(IntegrityError):
+            serializers.load_fixture(fixture, batch_size=1)
+        self.assertEqual(MinorUnitsModel.objects.count(), 0)
@@ -0,0 +1,69 @@
+from django.forms.models import modelform_factory
+from django.test import TestCase
+
+from money import Money
+
+from moneyfield import MoneyModelForm, stats
+from moneyfield.fields import AbstractMoneyProxy
+from testapp.models import FreeCurrencyModel
+
+
+class TestStats(TestCase):
+    def setUp(self):
+        stats.install()
+    
+    def tearDown(self):
+        stats.uninstall()
+        stats.reset()
+    
+    def test_uninstall_restores_methods(self):
+        self.assertTrue(stats.is_installed())
+        stats.uninstall()
+        self.assertFalse(stats.is_installed())
+        self.assertEqual(AbstractMoneyProxy.__get__.__code__.co_name,
+                         '__get__')
+        obj = FreeCurrencyModel()
+        obj.price = Money('1.00', 'EUR')
+        self.assertEqual(stats.get_stats(), {})
+    
+    def test_descriptors(self):
+        obj = FreeCurrencyModel()
+        obj.price = Money('1.00', 'EUR')
+        obj.price
+        obj.price
+        result = stats.get_stats()
+        get = result[('get', 'testapp.FreeCurrencyModel.price')]
+        self.assertEqual(get['count'], 2)
+        self.assertEqual(sum(get['histogram']), 2)
+        self.assertGreaterEqual(get['time'], 0)
+        self.assertEqual(
+            result[('set', 'testapp.FreeCurrencyModel.price')]['count'], 1)
+    
+    def test_forms(self):
+        Form = modelform_factory(FreeCurrencyModel, form=MoneyModelForm,
+                                 exclude=())
+        form = Form(data={'name': 'x', 'price_0': '1.00', 'price_1': 'EUR'})
+        self.assertTrue(form.is_valid())
+        result = stats.get_stats()
+        self.assertEqual(result[('compress', None)]['count'], 1)
+        clean = [value for (operation, name), value in result.items()
+                 if operation == 'clean']
+        self.assertEqual(len(clean), 1)
+        self.assertEqual(clean[0]['count'], 1)
+    
+    def test_signal(self):
+        calls = []
+        
+        def receiver(sender, operation, name, duration, **kwargs):
+            calls.append((operation, name))
+        stats.call_recorded.connect(receiver)
+        try:
+            FreeCurrencyModel().price
+        finally:
+            stats.call_recorded.disconnect(receiver)
+        self.assertEqual(calls, [('get', 'testapp.FreeCurrencyModel.price')])
+    
+    def test_reset(self):
+        FreeCurrencyModel().price
+        stats.reset()
+        self.assertEqual(stats.get_stats(), {})
@@ -0,0 +1,146 @@
+import io
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models.fields import FieldDoesNotExist
+from django.test import TestCase
+
+from money import Money
+
+from moneyfield import streaming
+from testapp.models import (FreeCurrencyModel, FixedCurrencyModel,
+                            FreeCurrencyManagerModel, MinorUnitsModel,
+                            RelatedMoneyModel)
+
+
+class TestStreamingExport(TestCase):
+    def setUp(self):
+        for amount, currency in [('1.00', 'EUR'), ('2.50', 'USD'),
+                                 ('3.00', 'EUR')]:
+            obj = FreeCurrencyModel(name=currency)
+            obj.price = Money(amount, currency)
+            obj.save()
+    
+    def test_iter_money_values_chunks(self):
+        queryset = FreeCurrencyModel.objects.all()
+        with self.assertNumQueries(2):
+            rows = list(streaming.iter_money_values(queryset, ['price'],
+                                                    chunk_size=2))
+        self.assertEqual(rows, [
+            {'price': Money('1.00', 'EUR')},
+            {'price': Money('2.50', 'USD')},
+            {'price': Money('3.00', 'EUR')},
+        ])
+    
+    def test_iter_money_values_filtered(self):
+        queryset = FreeCurrencyModel.objects.filter(price_currency='EUR')
+        rows = list(streaming.iter_money_values(queryset, ['name'],
+                                                chunk_size=1))
+        self.assertEqual(rows, [{'name': 'EUR'}, {'name': 'EUR'}])
+    
+    def test_export_csv(self):
+        stream = io.StringIO()
+        count = streaming.export_csv(FreeCurrencyModel.objects.all(), stream,
+                                     fields=['name', 'price'])
+        self.assertEqual(count, 3)
+        self.assertEqual(stream.getvalue().splitlines(), [
+            'name,price_amount,price_currency',
+            'EUR,1.00,EUR',
+            'USD,2.50,USD',
+            'EUR,3.00,EUR',
+        ])
+    
+    def test_export_jsonl(self):
+        stream = io.StringIO()
+        count = streaming.export_jsonl(FreeCurrencyModel.objects.all(),
+                                       stream, fields=['name', 'price'])
+        self.assertEqual(count, 3)
+        rows = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(rows[1], {
+            'name': 'USD',
+            'price': {'amount': '2.50', 'currency': 'USD'},
+        })
+    
+    def test_round_trip_csv(self):
+        stream = io.StringIO()
+        streaming.export_csv(FreeCurrencyModel.objects.all(), stream)
+        FreeCurrencyModel.objects.all().delete()
+        stream.seek(0)
+        with self.assertNumQueries(2):
+            count = streaming.import_csv(FreeCurrencyModel, stream,
+                                         chunk_size=2)
+        self.assertEqual(count, 3)
+        self.assertEqual(
+            sorted((obj.name, obj.price)
+                   for obj in FreeCurrencyModel.objects.all()),
+            [('EUR', Money('1.00', 'EUR')), ('EUR', Money('3.00', 'EUR')),
+             ('USD', Money('2.50', 'USD'))]
+        )
+    
+    def test_round_trip_jsonl(self):
+        stream = io.StringIO()
+        streaming.export_jsonl(FreeCurrencyModel.objects.all(), stream,
+                               fields=['name', 'price'])
+        stream.seek(0)
+        count = streaming.import_jsonl(MinorUnitsModel, stream)
+        self.assertEqual(count, 3)
+        self.assertEqual(MinorUnitsModel.objects.get(name='USD').price,
+                         Money('2.50', 'USD'))
+    
+    
+    def round_trip_related(self, export, import_):
+        product = FreeCurrencyManagerModel.objects.create(
+            price=Money('1.00', 'EUR'))
+        RelatedMoneyModel.objects.create(name='a', product=product)
+        RelatedMoneyModel.objects.create(name='b')
+        stream = io.StringIO()
+        export(RelatedMoneyModel.objects.all(), stream)
+        RelatedMoneyModel.objects.all().delete()
+        stream.seek(0)
+        self.assertEqual(import_(RelatedMoneyModel, stream), 2)
+        self.assertEqual(
+            list(RelatedMoneyModel.objects.order_by('name').values_list(
+                'name', 'product_id', 'fixed_product_id')),
+            [('a', product.pk, None), ('b', None, None)]
+        )
+    
+    def test_round_trip_csv_foreign_keys(self):
+        self.round_trip_related(streaming.export_csv, streaming.import_csv)
+    
+    def test_round_trip_jsonl_foreign_keys(self):
+        self.round_trip_related(streaming.export_jsonl,
+                                streaming.import_jsonl)
+
+
+class TestStreamingImport(TestCase):
+    def test_fixed_currency(self):
+        stream = io.StringIO('name,price_amount\nbook,12.50\n')
+        streaming.import_csv(FixedCurrencyModel, stream)
+        obj = FixedCurrencyModel.objects.get()
+        self.assertEqual(obj.price, Money('12.50', 'EUR'))
+    
+    def test_invalid_currency(self):
+        stream = io.StringIO('name,price_amount,price_currency\n'
+                             'a,1.00,EUR\n'
+                             'b,1.00,ZZZ\n')
+        with self.assertRaises(ValidationError):
+            streaming.import_csv(FreeCurrencyModel, stream)
+        self.assertEqual(FreeCurrencyModel.objects.count(), 0)
+    
+    def test_invalid_amount(self):
+        stream = io.StringIO('{"price": {"amount": "x", "currency": "EUR"}}\n')
+        with self.assertRaises(ValidationError):
+            streaming.import_jsonl(FreeCurrencyModel, stream)
+    
+    def test_unknown_field(self):
+        stream = io.StringIO('{"colour": "red"}\n')
+        with self.assertRaises(FieldDoesNotExist):
+            streaming.import_jsonl(FreeCurrencyModel, stream)
+    
+    def test_empty_lines(self):
+        stream = io.StringIO('\n{"price": {"amount": "1", "currency": "EUR"}}'
+                             '\n\n')
+        self.assertEqual(streaming.import_jsonl(FreeCurrencyModel, stream), 1)
+        self.assertEqual(FreeCurrencyModel.objects.get().price_amount,
+                         Decimal('1'))
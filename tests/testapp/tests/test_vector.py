@@ -0,0 +1,155 @@
+from decimal import Decimal
+from unittest import skipIf
+
+from django.core.exceptions import FieldError
+from django.test import TestCase
+
+from money import Money
+
+from testapp.models import (FreeCurrencyManagerModel,
+                            FixedCurrencyManagerModel, NumericCurrencyModel,
+                            MinorUnitsModel)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+else:
+    from moneyfield.vector import MoneyVector
+
+
+@skipIf(numpy is None, 'NumPy is not installed')
+class TestMoneyVector(TestCase):
+    def setUp(self):
+        self.vector = MoneyVector.from_money([
+            Money('1.25', 'EUR'),
+            Money('2.00', 'USD'),
+            Money('-3.35', 'EUR'),
+        ])
+    
+    def test_arrays(self):
+        self.assertEqual(self.vector.amounts.dtype, numpy.int64)
+        self.assertEqual(self.vector.amounts.tolist(), [125, 200, -335])
+        self.assertEqual(self.vector.codes.tolist(), [0, 1, 0])
+        self.assertEqual(self.vector.currencies, ('EUR', 'USD'))
+    
+    def test_to_money(self):
+        self.assertEqual(len(self.vector), 3)
+        self.assertEqual(self.vector[1], Money('2.00', 'USD'))
+        self.assertEqual(self.vector.to_money(), [
+            Money('1.25', 'EUR'),
+            Money('2.00', 'USD'),
+            Money('-3.35', 'EUR'),
+        ])
+    
+    def test_too_many_decimal_places(self):
+        with self.assertRaises(ValueError):
+            MoneyVector.from_money([Money('1.255', 'EUR')])
+    
+    def test_sum(self):
+        totals = self.vector.sum()
+        self.assertEqual(totals, {
+            'EUR': Money('-2.10', 'EUR'),
+            'USD': Money('2.00', 'USD'),
+        })
+        self.assertEqual(list(totals), ['EUR', 'USD'])
+    
+    def test_group_by_currency(self):
+        groups = self.vector.group_by_currency()
+        self.assertEqual(list(groups), ['EUR', 'USD'])
+        self.assertEqual(groups['EUR'].to_money(), [
+            Money('1.25', 'EUR'),
+            Money('-3.35', 'EUR'),
+        ])
+    
+    def test_round(self):
+        rounded = self.vector.round(1)
+        self.assertEqual(rounded.to_money(), [
+            Money('1.2', 'EUR'),
+            Money('2.0', 'USD'),
+            Money('-3.4', 'EUR'),
+        ])
+        self.assertEqual(rounded.round(3).amounts.tolist(),
+                         [1200, 2000, -3400])
+    
+    def test_convert(self):
+        converted = self.vector.convert('EUR', rates={'USD': Decimal('0.8')})
+        self.assertEqual(converted.currencies, ('EUR',))
+        self.assertEqual(converted.sum(), {'EUR': Money('-0.50', 'EUR')})
+    
+    def test_convert_unknown_rate(self):
+        with self.assertRaises(ValueError):
+            self.vector.convert('EUR', rates={'USD': None})
+    
+    def test_sum_overflow(self):
+        amount = 2 ** 62
+        vector = MoneyVector([amount, amount, 1], [0, 0, 0], ['EUR'], 0)
+        self.assertEqual(vector.sum(),
+                         {'EUR': Money(Decimal(2 * amount + 1), 'EUR')})
+    
+    def test_round_overflow(self):
+        vector = MoneyVector([2 ** 62], [0], ['EUR'], 0)
+        with self.assertRaises(ValueError):
+            vector.round(2)
+    
+    def test_convert_exact_above_float_precision(self):
+        amount = 2 ** 60 + 1
+        vector = MoneyVector([amount, 3], [0, 0], ['USD'], 2)
+        converted = vector.convert('EUR', rates={'USD': Decimal('0.5')})
+        # 2 ** 59 + 0.5 and 1.5, rounded half to even
+        self.assertEqual(converted.amounts.tolist(), [2 ** 59, 2])
+    
+    def test_convert_overflow(self):
+        vector = MoneyVector([2 ** 62], [0], ['USD'], 2)
+        with self.assertRaises(ValueError):
+            vector.convert('EUR', rates={'USD': 4})
+
+
+@skipIf(numpy is None, 'NumPy is not installed')
+class TestMoneyVectorFromQuerySet(TestCase):
+    def test_free_currency(self):
+        for amount, currency in [('1.00', 'EUR'), ('2.50', 'USD'),
+                                 ('3.00', 'EUR')]:
+            FreeCurrencyManagerModel.objects.create(
+                price=Money(amount, currency)
+            )
+        vector = MoneyVector.from_queryset(
+            FreeCurrencyManagerModel.objects.order_by('pk'), 'price'
+        )
+        self.assertEqual(vector.amounts.tolist(), [100, 250, 300])
+        self.assertEqual(vector.sum(), {
+            'EUR': Money('4.00', 'EUR'),
+            'USD': Money('2.50', 'USD'),
+        })
+    
+    def test_fixed_currency(self):
+        for amount in ['1.00', '2.00']:
+            FixedCurrencyManagerModel.objects.create(price_amount=amount)
+        vector = MoneyVector.from_queryset(
+            FixedCurrencyManagerModel.objects.all(), 'price'
+        )
+        self.assertEqual(vector.sum(), {'EUR': Money('3.00', 'EUR')})
+    
+    def test_minor_units(self):
+        MinorUnitsModel.objects.create(price=Money('12.34', 'EUR'))
+        vector = MoneyVector.from_queryset(MinorUnitsModel.objects.all(),
+                                           'price')
+        self.assertEqual(vector.to_money(), [Money('12.34', 'EUR')])
+    
+    def test_numeric_currency(self):
+        NumericCurrencyModel.objects.create(price=Money('1.00', 'USD'))
+        vector = MoneyVector.from_queryset(NumericCurrencyModel.objects.all(),
+                                           'price')
+        self.assertEqual(vector.to_money(), [Money('1.00', 'USD')])
+    
+    def test_empty(self):
+        vector = MoneyVector.from_queryset(
+            FreeCurrencyManagerModel.objects.none(), 'price'
+        )
+        self.assertEqual(len(vector), 0)
+        self.assertEqual(vector.sum(), {})
+    
+    def test_invalid_field(self):
+        with self.assertRaises(FieldError):
+            MoneyVector.from_queryset(FreeCurrencyManagerModel.objects.all(),
+                                      'name')